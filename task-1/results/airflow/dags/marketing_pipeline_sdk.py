@@ -7,42 +7,146 @@ import pandas as pd
 import json
 import os
 import logging
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from email.mime.base import MIMEBase
-from email import encoders
+import shutil
+import order_stats
+from task_cache import memoize_task
+from notifications import AttachmentMessage, FailureDigest, get_dispatcher
+from order_stats import (
+    get_order_stats, store_order_stats, group_orders, merge_groups, build_stats, read_orders,
+    successful_orders_summary, problem_orders_summary
+)
 
-def send_success_email():
+# Размер порции при чтении orders.csv: память задачи ограничена порцией, а не размером файла
+ORDERS_CHUNK_SIZE = int(os.getenv('ORDERS_CHUNK_SIZE', '100000'))
+# Компактные типы: статусы и категории повторяются, точности float32 для сумм заказов достаточно
+ORDERS_DTYPES = {
+    'status': 'category',
+    'product_category': 'category',
+    'amount': 'float32',
+}
+ORDERS_SOURCE_FILE = '/opt/airflow/sample_data/orders.csv'
+ORDERS_COLUMNS = ['order_id', 'user_id', 'amount', 'status', 'created_date', 'product_category']
+# Промежуточные данные между задачами - Parquet с партициями status=<статус>/,
+# CSV собирается только для письма с отчетами
+ORDERS_DATASET_DIR = '/opt/airflow/results/orders_dataset'
+# Число партиций по хэшу order_id для параллельной обработки через dynamic task mapping.
+# 0 - обычный режим с ветвлением на обработку успешных или проблемных заказов
+ORDERS_PARTITIONS = int(os.getenv('ORDERS_PARTITIONS', '0'))
+
+def build_report(processing_type, summary):
+    return {
+        'processing_type': processing_type,
+        'count': summary['count'],
+        'total_value': summary['total_value'],
+        'avg_value': summary['avg_value'],
+        'status_breakdown': summary['status_breakdown'],
+        'generated_at': datetime.now().isoformat()
+    }
+
+def export_orders_csv(csv_file):
+    import pyarrow.dataset as ds
+    
+    dataset = ds.dataset(ORDERS_DATASET_DIR, format='parquet', partitioning='hive')
+    tmp_file = f"{csv_file}.tmp"
+    pd.DataFrame(columns=ORDERS_COLUMNS).to_csv(tmp_file, index=False)
+    # Набор читается батчами, поэтому память не зависит от его размера
+    for batch in dataset.to_batches(columns=ORDERS_COLUMNS):
+        batch.to_pandas().to_csv(tmp_file, index=False, header=False, mode='a')
+    os.replace(tmp_file, csv_file)
+    return csv_file
+
+EXECUTIVE_SUMMARY_FILE = '/opt/airflow/results/executive_summary.json'
+EXECUTIVE_SUMMARY_REPORT_FILE = '/opt/airflow/results/executive_summary_report.csv'
+BRANCH_REPORT_TITLES = {
+    'successful_orders': 'Успешные заказы',
+    'problem_orders': 'Проблемные заказы',
+}
+
+def build_executive_summary(analysis_result, branch_reports, execution_date, processing_type):
+    # Сводка собирается из результатов анализа и отчетов веток без повторного чтения данных.
+    # Отчет пропущенной ветки приходит как None и в сводку не попадает
+    reports = {
+        report_type: report
+        for report_type, report in (branch_reports or {}).items()
+        if report
+    }
+    
+    return {
+        'executive_summary': {
+            'pipeline_name': 'Marketing Data Processing Pipeline',
+            'execution_date': execution_date,
+            'execution_status': 'completed',
+            'processing_type': processing_type,
+            'key_metrics': {
+                'total_orders': analysis_result['total_orders'],
+                'completed_orders': analysis_result['completed_orders'],
+                'problem_orders': analysis_result['problem_orders'],
+                'total_revenue': analysis_result['total_revenue'],
+                'avg_order_value': analysis_result['avg_order_value'],
+                'success_rate': analysis_result['success_rate'],
+            },
+            'processing_paths': list(reports),
+            'branch_reports': {
+                report_type: {
+                    'count': report['count'],
+                    'total_value': report['total_value'],
+                    'avg_value': report['avg_value'],
+                    'status_breakdown': report['status_breakdown'],
+                }
+                for report_type, report in reports.items()
+            },
+            'next_steps': [
+                'Review status-based processing results',
+                'Analyze order status trends',
+                'Schedule next pipeline run',
+                'Monitor order statuses'
+            ],
+            'generated_at': datetime.now().isoformat()
+        }
+    }
+
+def executive_summary_rows(executive_summary):
+    summary = executive_summary['executive_summary']
+    metrics = summary['key_metrics']
+    rows = [
+        ('Общее количество заказов', metrics['total_orders']),
+        ('Успешных заказов', metrics['completed_orders']),
+        ('Проблемных заказов', metrics['problem_orders']),
+        ('Общая сумма заказов', f"{metrics['total_revenue']:.2f}"),
+        ('Средний чек', f"{metrics['avg_order_value']:.2f}"),
+        ('Процент успешных заказов', f"{metrics['success_rate']:.1f}"),
+    ]
+    
+    for report_type, report in summary['branch_reports'].items():
+        title = BRANCH_REPORT_TITLES.get(report_type, report_type)
+        rows.extend([
+            (f"{title}: количество", report['count']),
+            (f"{title}: сумма", f"{report['total_value']:.2f}"),
+            (f"{title}: средний чек", f"{report['avg_value']:.2f}"),
+        ])
+    
+    return rows
+
+def write_executive_summary(executive_summary):
+    with open(EXECUTIVE_SUMMARY_FILE, 'w') as f:
+        json.dump(executive_summary, f, indent=2)
+    
+    rows = executive_summary_rows(executive_summary)
+    summary_df = pd.DataFrame(rows, columns=['metric', 'value'])
+    summary_df.to_csv(EXECUTIVE_SUMMARY_REPORT_FILE, index=False, encoding='utf-8')
+
+def send_success_email(executive_summary):
     print("Отправка email об успешном выполнении пайплайна с отчетами") 
     current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     
+    # Отчет уже записан create_executive_summary из той же сводки, что передана через XCom
+    summary_file = EXECUTIVE_SUMMARY_REPORT_FILE if os.path.exists(EXECUTIVE_SUMMARY_REPORT_FILE) else None
+    metrics = executive_summary['executive_summary']['key_metrics']
+    
     try:
-        orders_df = pd.read_csv('/opt/airflow/results/orders_processed.csv')
-        summary_data = {
-            'metric': [
-                'Общее количество заказов',
-                'Успешных заказов',
-                'Проблемных заказов',
-                'Общая сумма заказов',
-                'Средний чек'
-            ],
-            'value': [
-                len(orders_df),
-                len(orders_df[orders_df['status'] == 'completed']),
-                len(orders_df[orders_df['status'] != 'completed']),
-                f"{orders_df['amount'].sum():.2f}",
-                f"{orders_df['amount'].mean():.2f}"
-            ]
-        }
-        
-        summary_df = pd.DataFrame(summary_data)
-        summary_file = '/opt/airflow/results/executive_summary_report.csv'
-        summary_df.to_csv(summary_file, index=False, encoding='utf-8')
-        print(f"Создан сводный отчет: {summary_file}")
+        export_orders_csv('/opt/airflow/results/orders_processed.csv')
     except Exception as e:
-        print(f"Ошибка создания сводного отчета: {e}")
-        summary_file = None
+        print(f"Ошибка выгрузки заказов в CSV: {e}")
     
     body = f"""
     Пайплайн Marketing Data Pipeline выполнен успешно!
@@ -52,6 +156,13 @@ def send_success_email():
     
     Время выполнения: {current_time}
     
+    Ключевые показатели:
+    - Всего заказов: {metrics['total_orders']}
+    - Успешных заказов: {metrics['completed_orders']} ({metrics['success_rate']:.1f}%)
+    - Проблемных заказов: {metrics['problem_orders']}
+    - Общая сумма заказов: {metrics['total_revenue']:.2f}
+    - Средний чек: {metrics['avg_order_value']:.2f}
+    
     Вложения:
     - executive_summary_report.csv - Сводка по успешным и проблемным заказам
     - orders_processed.csv - Данные заказов с разбивкой по статусам
@@ -61,51 +172,21 @@ def send_success_email():
 
 def send_error_email(context):
     try:
-        print("Отправка email об ошибке в пайплайне")
         task_instance = context.get('task_instance')
         task_id = task_instance.task_id if task_instance else 'unknown'
         dag_id = context.get('dag').dag_id if context.get('dag') else 'unknown'
-        current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        
-        body = f"""
-        Ошибка в пайплайне Marketing Data Pipeline!
-        
-        Задача: {task_id}
-        DAG: {dag_id}
-        Время ошибки: {current_time}
+        run_id = context.get('run_id', 'unknown')
         
-        Пожалуйста, проверьте логи для получения подробной информации.
-        """.strip()
-        
-        send_email('admin@company.com', 'Ошибка в пайплайне', body)
-        print(f"Email об ошибке отправлен для задачи {task_id}")
+        # Колбэк не ходит в SMTP: ошибки запуска уходят одним письмом из send_failure_digest
+        FailureDigest().record(run_id, dag_id, task_id, context.get('exception'))
+        print(f"Ошибка задачи {task_id} добавлена в сводку запуска {run_id}")
         
     except Exception as e:
         print(f"Ошибка при отправке email об ошибке: {str(e)}")
         logging.error(f"Ошибка при отправке email об ошибке: {str(e)}")
 
-def send_email(email_to, subject, body):
-    try:
-        msg = MIMEText(body, "plain", "utf-8")
-        msg["Subject"] = subject
-        msg["From"] = "airflow@company.com"
-        msg["To"] = email_to
-
-        with smtplib.SMTP('mailhog', 1025) as server:
-            server.sendmail("airflow@company.com", email_to, msg.as_string())
-        print(f"Email отправлен успешно на {email_to}")
-    except Exception as e:
-        print(f"Ошибка отправки email: {e}")
-
 def send_email_with_attachments(email_to, subject, body, summary_file=None):
     try:
-        msg = MIMEMultipart()
-        msg["Subject"] = subject
-        msg["From"] = "airflow@company.com"
-        msg["To"] = email_to
-
-        msg.attach(MIMEText(body, "plain", "utf-8"))
-
         attachments = []
         
         if summary_file and os.path.exists(summary_file):
@@ -119,26 +200,15 @@ def send_email_with_attachments(email_to, subject, body, summary_file=None):
             if os.path.exists(file_path):
                 attachments.append(file_path)
 
-        for file_path in attachments:
-            try:
-                with open(file_path, "rb") as attachment:
-                    part = MIMEBase('application', 'octet-stream')
-                    part.set_payload(attachment.read())
-                
-                encoders.encode_base64(part)
-                filename = os.path.basename(file_path)
-                part.add_header(
-                    'Content-Disposition',
-                    f'attachment; filename= {filename}'
-                )
-                msg.attach(part)
-                print(f"Прикреплен файл: {filename}")
-            except Exception as e:
-                print(f"Ошибка прикрепления файла {file_path}: {e}")
-
-        with smtplib.SMTP('mailhog', 1025) as server:
-            server.sendmail("airflow@company.com", email_to, msg.as_string())
-        print(f"Email с вложениями отправлен успешно на {email_to}")
+        # Файлы не читаются здесь: диспетчер сжимает и кодирует их порциями при отправке
+        msg = AttachmentMessage(subject, body, attachments)
+        for file_path in msg.attachments:
+            print(f"Прикреплен файл: {os.path.basename(file_path)}")
+        for filename, location in msg.links:
+            print(f"Файл {filename} слишком большой, в письмо добавлена ссылка: {location}")
+
+        get_dispatcher().send(email_to, msg)
+        print(f"Email с вложениями поставлен в очередь отправки на {email_to}")
     except Exception as e:
         print(f"Ошибка отправки email с вложениями: {e}")
 
@@ -162,7 +232,14 @@ with DAG(
     dag_display_name='Демо пайплайн для маркетингового отдела - POC Task 1',
 ) as dag:
 
+    # Повторный запуск на неизмененном orders.csv берет результаты задач из кэша
     @task(retries=1, retry_delay=timedelta(minutes=1), on_failure_callback=send_error_email)
+    @memoize_task(
+        ORDERS_SOURCE_FILE,
+        outputs=[ORDERS_DATASET_DIR],
+        code=[order_stats],
+        config={'partitions': ORDERS_PARTITIONS}
+    )
     def read_from_files():
         try:
             import random
@@ -170,22 +247,49 @@ with DAG(
             if random.random() < 0.8:
                 raise Exception("Симуляция ошибки чтения файлов - файл поврежден")
             
-            df = pd.read_csv('/opt/airflow/sample_data/orders.csv')
             source = "CSV Files"
-            
             os.makedirs('/opt/airflow/results', exist_ok=True)
-            df.to_csv('/opt/airflow/results/orders_processed.csv', index=False)
             
+            # Файл читается порциями: агрегаты по статусам копятся на ходу, порции сразу раскладываются
+            # по партициям набора, а под итоговым именем набор появляется только целиком
+            tmp_dir = f"{ORDERS_DATASET_DIR}.tmp"
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            by_status = {}
+            chunks = pd.read_csv(
+                ORDERS_SOURCE_FILE,
+                dtype=ORDERS_DTYPES,
+                chunksize=ORDERS_CHUNK_SIZE
+            )
+            partition_cols = ['status']
+            for chunk_number, chunk in enumerate(chunks):
+                merge_groups(by_status, group_orders(chunk))
+                if ORDERS_PARTITIONS:
+                    # Хэш pandas детерминирован, поэтому заказ всегда попадает в одну и ту же партицию
+                    hashes = pd.util.hash_pandas_object(chunk['order_id'], index=False)
+                    chunk['partition'] = (hashes % ORDERS_PARTITIONS).astype('int32')
+                    partition_cols = ['status', 'partition']
+                chunk.to_parquet(
+                    tmp_dir,
+                    partition_cols=partition_cols,
+                    index=False,
+                    basename_template=f"chunk-{chunk_number:05d}-{{i}}.parquet"
+                )
+            shutil.rmtree(ORDERS_DATASET_DIR, ignore_errors=True)
+            os.replace(tmp_dir, ORDERS_DATASET_DIR)
+            
+            # Статистика посчитана при чтении и кэшируется для следующих задач
+            totals = build_stats(by_status)
+            store_order_stats(ORDERS_DATASET_DIR, totals)
             stats = {
-                'total_orders': len(df),
-                'completed_orders': len(df[df['status'] == 'completed']),
-                'problem_orders': len(df[df['status'] != 'completed']),
-                'total_revenue': float(df['amount'].sum()),
-                'avg_order_value': float(df['amount'].mean()),
+                'total_orders': totals['total_orders'],
+                'completed_orders': totals['completed_orders'],
+                'problem_orders': totals['problem_orders'],
+                'total_revenue': totals['total_revenue'],
+                'avg_order_value': totals['avg_order_value'],
                 'source': source
             }
             
-            logging.info(f"Извлечено {len(df)} заказов из файловой системы")
+            logging.info(f"Извлечено {stats['total_orders']} заказов из файловой системы")
             return stats
             
         except Exception as e:
@@ -193,6 +297,7 @@ with DAG(
             raise
 
     @task(retries=2, retry_delay=timedelta(minutes=1), on_failure_callback=send_error_email)
+    @memoize_task(ORDERS_SOURCE_FILE, outputs=['/opt/airflow/results/orders_analysis.json'])
     def analyze_orders(orders_stats):
         try:
             import random
@@ -204,6 +309,7 @@ with DAG(
             completed_orders = orders_stats['completed_orders']
             problem_orders = orders_stats['problem_orders']
             total_revenue = orders_stats['total_revenue']
+            avg_order_value = orders_stats['avg_order_value']
             
             success_rate = (completed_orders / total_orders * 100) if total_orders > 0 else 0
             
@@ -220,6 +326,7 @@ with DAG(
                 'completed_orders': completed_orders,
                 'problem_orders': problem_orders,
                 'total_revenue': total_revenue,
+                'avg_order_value': avg_order_value,
                 'success_rate': success_rate
             }
             
@@ -260,6 +367,7 @@ with DAG(
             return 'process_problem_orders'
 
     @task(retries=2, retry_delay=timedelta(minutes=1), on_failure_callback=send_error_email)
+    @memoize_task(ORDERS_SOURCE_FILE, outputs=['/opt/airflow/results/successful_orders_report.json'], code=[order_stats])
     def process_successful_orders():
         try:
             import random
@@ -269,22 +377,16 @@ with DAG(
             
             logging.info("Обработка успешных заказов")
             
-            orders_df = pd.read_csv('/opt/airflow/results/orders_processed.csv')
-            successful_orders = orders_df[orders_df['status'] == 'completed']
+            successful_orders = successful_orders_summary(
+                get_order_stats(ORDERS_DATASET_DIR, filters=[('status', '==', 'completed')])
+            )
             
-            report = {
-                'processing_type': 'successful_orders',
-                'count': len(successful_orders),
-                'total_value': float(successful_orders['amount'].sum()),
-                'avg_value': float(successful_orders['amount'].mean()),
-                'status_breakdown': successful_orders['status'].value_counts().to_dict(),
-                'generated_at': datetime.now().isoformat()
-            }
+            report = build_report('successful_orders', successful_orders)
             
             with open('/opt/airflow/results/successful_orders_report.json', 'w') as f:
                 json.dump(report, f, indent=2)
             
-            logging.info(f"Обработано {len(successful_orders)} успешных заказов")
+            logging.info(f"Обработано {successful_orders['count']} успешных заказов")
             return report
                 
         except Exception as e:
@@ -292,6 +394,7 @@ with DAG(
             raise
 
     @task(retries=2, retry_delay=timedelta(minutes=1), on_failure_callback=send_error_email)
+    @memoize_task(ORDERS_SOURCE_FILE, outputs=['/opt/airflow/results/problem_orders_report.json'], code=[order_stats])
     def process_problem_orders():
         try:
             import random
@@ -301,96 +404,104 @@ with DAG(
             
             logging.info("Обработка проблемных заказов")
             
-            orders_df = pd.read_csv('/opt/airflow/results/orders_processed.csv')
-            problem_orders = orders_df[orders_df['status'] != 'completed']
+            problem_orders = problem_orders_summary(
+                get_order_stats(ORDERS_DATASET_DIR, filters=[('status', '!=', 'completed')])
+            )
             
-            report = {
-                'processing_type': 'problem_orders',
-                'count': len(problem_orders),
-                'total_value': float(problem_orders['amount'].sum()),
-                'avg_value': float(problem_orders['amount'].mean()),
-                'status_breakdown': problem_orders['status'].value_counts().to_dict(),
-                'generated_at': datetime.now().isoformat()
-            }
+            report = build_report('problem_orders', problem_orders)
             
             with open('/opt/airflow/results/problem_orders_report.json', 'w') as f:
                 json.dump(report, f, indent=2)
             
-            logging.info(f"Обработано {len(problem_orders)} проблемных заказов")
+            logging.info(f"Обработано {problem_orders['count']} проблемных заказов")
             return report
                 
         except Exception as e:
             logging.error(f"Ошибка обработки проблемных заказов: {str(e)}")
             raise
 
-    @task(retries=2, retry_delay=timedelta(minutes=1), on_failure_callback=send_error_email, trigger_rule=TriggerRule.NONE_FAILED_MIN_ONE_SUCCESS)
-    def create_executive_summary(**context):
+    @task(retries=2, retry_delay=timedelta(minutes=1), on_failure_callback=send_error_email)
+    @memoize_task(ORDERS_SOURCE_FILE, code=[order_stats], config={'partitions': ORDERS_PARTITIONS})
+    def process_order_partition(partition):
         try:
-            executive_summary = {
-                'executive_summary': {
-                    'pipeline_name': 'Marketing Data Processing Pipeline',
-                    'execution_date': context.get('ds', context.get('logical_date', datetime.now().strftime('%Y-%m-%d'))),
-                    'execution_status': 'completed',
-                    'processing_type': 'status_based_branching',
-                    'key_metrics': {
-                        'total_orders_processed': 'Available in detailed reports',
-                        'status_analysis': 'Completed with branching',
-                        'processing_paths': 'Successful/Problematic orders processing'
-                    },
-                    'next_steps': [
-                        'Review status-based processing results',
-                        'Analyze order status trends',
-                        'Schedule next pipeline run',
-                        'Monitor order statuses'
-                    ],
-                    'generated_at': datetime.now().isoformat()
-                }
-            }
+            # Каждая копия задачи читает только свою партицию и возвращает частичные агрегаты по статусам
+            orders_df = read_orders(ORDERS_DATASET_DIR, ['status', 'amount'], filters=[('partition', '==', partition)])
+            by_status = group_orders(orders_df)
             
-            try:
-                with open('/opt/airflow/results/executive_summary.json', 'w') as f:
-                    json.dump(executive_summary, f, indent=2)
-                logging.info(f"Файл executive_summary.json создан успешно")
-            except Exception as e:
-                logging.error(f"Ошибка создания файла executive_summary.json: {str(e)}")
-                with open('/opt/airflow/results/executive_summary.json', 'w') as f:
-                    json.dump(executive_summary, f, indent=2)
+            logging.info(f"Партиция {partition}: обработано {len(orders_df)} заказов")
+            return {'partition': partition, 'by_status': by_status}
             
-            logging.info("Создана исполнительная сводка")
-            return executive_summary
+        except Exception as e:
+            logging.error(f"Ошибка обработки партиции {partition}: {str(e)}")
+            raise
+
+    @task(retries=2, retry_delay=timedelta(minutes=1), on_failure_callback=send_error_email)
+    def merge_order_partitions(partition_results):
+        try:
+            # Складываются количества и суммы, средние пересчитываются из сумм и количеств
+            by_status = {}
+            for partition_result in partition_results:
+                merge_groups(by_status, partition_result['by_status'])
+            stats = build_stats(by_status)
+            
+            reports = {
+                'successful_orders': build_report('successful_orders', successful_orders_summary(stats)),
+                'problem_orders': build_report('problem_orders', problem_orders_summary(stats)),
+            }
+            for processing_type, report in reports.items():
+                with open(f'/opt/airflow/results/{processing_type}_report.json', 'w') as f:
+                    json.dump(report, f, indent=2)
+            
+            logging.info(
+                f"Объединены партиции: {stats['completed_orders']} успешных и "
+                f"{stats['problem_orders']} проблемных заказов"
+            )
+            return reports
             
         except Exception as e:
-            logging.error(f"Ошибка создания исполнительной сводки: {str(e)}")
+            logging.error(f"Ошибка объединения партиций: {str(e)}")
             raise
 
-        @task(trigger_rule=TriggerRule.ONE_FAILED)
-        def send_immediate_failure_alert(**context):
-            failed_tasks = []
-            task_instance = context.get('task_instance')
+    @task(retries=2, retry_delay=timedelta(minutes=1), on_failure_callback=send_error_email, trigger_rule=TriggerRule.NONE_FAILED_MIN_ONE_SUCCESS)
+    def create_executive_summary(analysis_result, branch_reports, **context):
+        try:
+            executive_summary = build_executive_summary(
+                analysis_result,
+                branch_reports,
+                context.get('ds', context.get('logical_date', datetime.now().strftime('%Y-%m-%d'))),
+                'partitioned' if ORDERS_PARTITIONS else 'status_based_branching'
+            )
             
-            if task_instance and task_instance.state == 'failed':
-                failed_tasks.append(task_instance.task_id)
+            # JSON и CSV-отчет для письма рендерятся из одной сводки
+            write_executive_summary(executive_summary)
+            logging.info(f"Созданы {EXECUTIVE_SUMMARY_FILE} и {EXECUTIVE_SUMMARY_REPORT_FILE}")
             
-            if failed_tasks:
-                body = f"""
-                СРОЧНО: Ошибка в пайплайне Marketing Data Pipeline!
-                
-                Упавшие задачи: {', '.join(failed_tasks)}
-                Время: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-                
-                Пайплайн остановлен. Требуется вмешательство.
-                """
-                
-                send_email('admin@company.com', 'СРОЧНО: Ошибка в пайплайне', body)
-                print(f"Отправлено срочное уведомление об ошибке в: {failed_tasks}")
+            logging.info("Создана исполнительная сводка")
+            return executive_summary
             
-            return {"failed_tasks": failed_tasks}
+        except Exception as e:
+            logging.error(f"Ошибка создания исполнительной сводки: {str(e)}")
+            raise
 
     @task(retries=1, retry_delay=timedelta(minutes=1), on_failure_callback=send_error_email, trigger_rule=TriggerRule.NONE_FAILED_MIN_ONE_SUCCESS)
-    def send_notification():
-        send_success_email()
+    def send_notification(executive_summary):
+        send_success_email(executive_summary)
+        # Задача завершается только после того, как письмо реально ушло
+        get_dispatcher().flush()
         return "Success email sent"
 
+    @task(trigger_rule=TriggerRule.ALL_DONE)
+    def send_failure_digest(**context):
+        # Выполняется после всех задач запуска и отправляет накопленные ошибки одним письмом
+        failures = FailureDigest().send(context.get('run_id', 'unknown'), 'admin@company.com')
+        failed_tasks = [failure['task_id'] for failure in failures]
+        
+        if failed_tasks:
+            get_dispatcher().flush()
+            print(f"Отправлена сводка ошибок по задачам: {failed_tasks}")
+        
+        return {"failed_tasks": failed_tasks}
+
     start_pipeline = EmptyOperator(
         task_id='start_pipeline',
         dag=dag
@@ -403,23 +514,8 @@ with DAG(
     analyze_orders_task = analyze_orders(read_files_task)
     analyze_orders_task.display_name = "Анализ данных"
 
-    decide_path_task = decide_processing_path(analyze_orders_task)
-    decide_path_task.display_name = "Принятие решения о ветвлении"
-
-    process_successful_task = process_successful_orders()
-    process_successful_task.display_name = "Обработка успешных заказов"
-
-    process_problem_task = process_problem_orders()
-    process_problem_task.display_name = "Обработка проблемных заказов"
-
-    executive_summary_task = create_executive_summary()
-    executive_summary_task.display_name = "Создание исполнительной сводки"
-
-    notification_task = send_notification()
-    notification_task.display_name = "Отправка уведомления"
-
-    failure_alert = send_immediate_failure_alert()
-    failure_alert.display_name = "Срочное уведомление об ошибке"
+    failure_alert = send_failure_digest()
+    failure_alert.display_name = "Сводка ошибок запуска"
 
     end_pipeline = EmptyOperator(
         task_id='end_pipeline',
@@ -428,8 +524,43 @@ with DAG(
     )
     end_pipeline.display_name = "Завершение пайплайна"
 
-    start_pipeline >> read_files_task >> analyze_orders_task >> decide_path_task
-    decide_path_task >> [process_successful_task, process_problem_task]
-    [process_successful_task, process_problem_task] >> executive_summary_task >> notification_task >> end_pipeline
+    if ORDERS_PARTITIONS:
+        # Партиции обрабатываются параллельно на воркерах, оба отчета собираются из частичных агрегатов
+        process_partitions_task = process_order_partition.expand(partition=list(range(ORDERS_PARTITIONS)))
+        process_partitions_task.display_name = "Обработка партиций заказов"
+
+        merge_partitions_task = merge_order_partitions(process_partitions_task)
+        merge_partitions_task.display_name = "Объединение партиций"
+
+        start_pipeline >> read_files_task >> analyze_orders_task >> process_partitions_task
+        processing_tasks = [process_partitions_task, merge_partitions_task]
+        branch_reports = merge_partitions_task
+    else:
+        decide_path_task = decide_processing_path(analyze_orders_task)
+        decide_path_task.display_name = "Принятие решения о ветвлении"
+
+        process_successful_task = process_successful_orders()
+        process_successful_task.display_name = "Обработка успешных заказов"
+
+        process_problem_task = process_problem_orders()
+        process_problem_task.display_name = "Обработка проблемных заказов"
+
+        start_pipeline >> read_files_task >> analyze_orders_task >> decide_path_task
+        decide_path_task >> [process_successful_task, process_problem_task]
+        processing_tasks = [decide_path_task, process_successful_task, process_problem_task]
+        # Отчет пропущенной ветки разрешается в None
+        branch_reports = {'successful_orders': process_successful_task, 'problem_orders': process_problem_task}
+
+    # Сводка получает результаты анализа и отчеты веток через XCom, письмо - готовую сводку
+    executive_summary_task = create_executive_summary(analyze_orders_task, branch_reports)
+    executive_summary_task.display_name = "Создание исполнительной сводки"
+
+    notification_task = send_notification(executive_summary_task)
+    notification_task.display_name = "Отправка уведомления"
+
+    notification_task >> end_pipeline
 
-    [read_files_task, analyze_orders_task, decide_path_task, process_successful_task, process_problem_task] >> failure_alert
\ No newline at end of file
+    [
+        read_files_task, analyze_orders_task, *processing_tasks,
+        executive_summary_task, notification_task
+    ] >> failure_alert
\ No newline at end of file
@@ -0,0 +1,318 @@
+import atexit
+import base64
+import json
+import os
+import re
+import time
+import uuid
+import zlib
+import queue
+import logging
+import smtplib
+import zipfile
+import threading
+from datetime import datetime
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+
+SMTP_HOST = os.getenv('SMTP_HOST', 'mailhog')
+SMTP_PORT = int(os.getenv('SMTP_PORT', '1025'))
+SMTP_SENDER = 'airflow@company.com'
+FAILURE_SPOOL_DIR = '/opt/airflow/results/notifications'
+# Сжатие вложений: gzip, zip или none
+ATTACHMENT_COMPRESSION = os.getenv('ATTACHMENT_COMPRESSION', 'gzip')
+# Файлы больше порога (по размеру до сжатия) не прикрепляются, в письме остается ссылка или путь
+ATTACHMENT_MAX_BYTES = int(os.getenv('ATTACHMENT_MAX_BYTES', str(50 * 1024 * 1024)))
+# Адрес, по которому файлы из results доступны получателям; без него в письме указывается путь
+ATTACHMENT_LINK_BASE = os.getenv('ATTACHMENT_LINK_BASE', '')
+ATTACHMENT_CHUNK_SIZE = 1024 * 1024
+# base64 кодирует по 57 байт в строку из 76 символов
+BASE64_LINE_BYTES = 57
+
+ATTACHMENT_TYPES = {
+    'gzip': ('application/gzip', '.gz'),
+    'zip': ('application/zip', '.zip'),
+    'none': ('application/octet-stream', ''),
+}
+
+def _to_wire(data):
+    # Переводы строк SMTP и экранирование точки в начале строки, как в sendmail
+    data = re.sub(rb'\r?\n', b'\r\n', data)
+    return re.sub(rb'(?m)^\.', b'..', data)
+
+class _BufferSink:
+    # Несмещаемый поток для zipfile: архив пишется с дескрипторами данных и забирается порциями
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def write(self, data):
+        self.buffer += data
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+def _file_blocks(path):
+    with open(path, 'rb') as f:
+        yield from iter(lambda: f.read(ATTACHMENT_CHUNK_SIZE), b'')
+
+def _gzip_blocks(path):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for block in _file_blocks(path):
+        yield compressor.compress(block)
+    yield compressor.flush()
+
+def _zip_blocks(path):
+    sink = _BufferSink()
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED) as archive:
+        with archive.open(os.path.basename(path), 'w', force_zip64=True) as member:
+            for block in _file_blocks(path):
+                member.write(block)
+                yield sink.take()
+    yield sink.take()
+
+class AttachmentMessage:
+    # Письмо с вложениями, которое не собирается в памяти целиком: файлы читаются порциями,
+    # сжимаются и кодируются в base64 прямо в поток DATA SMTP-соединения
+    def __init__(self, subject, body, paths, compression=ATTACHMENT_COMPRESSION,
+                 max_bytes=ATTACHMENT_MAX_BYTES, link_base=ATTACHMENT_LINK_BASE):
+        if compression not in ATTACHMENT_TYPES:
+            raise ValueError(f"Неизвестное сжатие вложений: {compression}")
+        self.compression = compression
+        self.attachments = []
+        self.links = []
+
+        for path in paths:
+            filename = os.path.basename(path)
+            if max_bytes and os.path.getsize(path) > max_bytes:
+                location = f"{link_base.rstrip('/')}/{filename}" if link_base else os.path.abspath(path)
+                self.links.append((filename, location))
+            else:
+                self.attachments.append(path)
+
+        if self.links:
+            lines = [f"- {filename}: {location}" for filename, location in self.links]
+            body = "\n".join([body, "", "Файлы слишком большие для вложения и доступны по ссылкам:", *lines])
+
+        self.root = MIMEMultipart()
+        self.root.set_boundary(f"===============attachments{uuid.uuid4().hex}==")
+        self.root['Subject'] = subject
+        self.root.attach(MIMEText(body, "plain", "utf-8"))
+
+    def __getitem__(self, name):
+        return self.root[name]
+
+    def __setitem__(self, name, value):
+        self.root[name] = value
+
+    def __delitem__(self, name):
+        del self.root[name]
+
+    def _encoded_blocks(self, path):
+        blocks = {'gzip': _gzip_blocks, 'zip': _zip_blocks, 'none': _file_blocks}[self.compression](path)
+        pending = b''
+        for block in blocks:
+            pending += block
+            cut = len(pending) - len(pending) % BASE64_LINE_BYTES
+            if cut:
+                yield base64.encodebytes(pending[:cut]).replace(b'\n', b'\r\n')
+                pending = pending[cut:]
+        if pending:
+            yield base64.encodebytes(pending).replace(b'\n', b'\r\n')
+
+    def iter_chunks(self):
+        # Заголовки и текст письма генерирует email, вложения дописываются вместо закрывающей границы
+        boundary = self.root.get_boundary()
+        head = self.root.as_bytes()
+        yield _to_wire(head[:head.rindex(f"--{boundary}--".encode())])
+
+        content_type, suffix = ATTACHMENT_TYPES[self.compression]
+        for path in self.attachments:
+            yield _to_wire("\n".join([
+                f"--{boundary}",
+                f"Content-Type: {content_type}",
+                "Content-Transfer-Encoding: base64",
+                f'Content-Disposition: attachment; filename="{os.path.basename(path)}{suffix}"',
+                "",
+                "",
+            ]).encode('utf-8'))
+            yield from self._encoded_blocks(path)
+
+        yield f"--{boundary}--\r\n".encode()
+
+class SmtpDispatcher:
+    # Письма уходят из фонового потока через одно постоянное SMTP-соединение:
+    # задача только ставит письмо в очередь и не ждет сервер
+    def __init__(self, host=SMTP_HOST, port=SMTP_PORT, sender=SMTP_SENDER,
+                 max_retries=3, retry_delay=1.0, queue_size=100, timeout=10):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.timeout = timeout
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.server = None
+        self.sent = 0
+        self.failed = 0
+        self.connects = 0
+        self.worker = threading.Thread(target=self._run, name='smtp-dispatcher', daemon=True)
+        self.worker.start()
+
+    def send(self, email_to, message):
+        del message['From'], message['To']
+        message['From'] = self.sender
+        message['To'] = email_to
+        self.queue.put((email_to, message))
+
+    def flush(self):
+        self.queue.join()
+
+    def close(self):
+        self.flush()
+        self.queue.put(None)
+        self.worker.join()
+
+    def _connect(self):
+        if self.server is not None:
+            try:
+                # NOOP проверяет, что сервер не закрыл соединение по простою
+                if self.server.noop()[0] == 250:
+                    return self.server
+            except smtplib.SMTPException:
+                pass
+            self._disconnect()
+
+        self.server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        self.connects += 1
+        return self.server
+
+    def _disconnect(self):
+        if self.server is None:
+            return
+        try:
+            self.server.quit()
+        except (smtplib.SMTPException, OSError):
+            pass
+        self.server = None
+
+    def _send_stream(self, server, email_to, message):
+        # Как sendmail, но тело письма передается порциями, а не одной строкой
+        server.ehlo_or_helo_if_needed()
+        code, response = server.mail(self.sender)
+        if code != 250:
+            raise smtplib.SMTPSenderRefused(code, response, self.sender)
+        code, response = server.rcpt(email_to)
+        if code not in (250, 251):
+            raise smtplib.SMTPRecipientsRefused({email_to: (code, response)})
+        code, response = server.docmd('DATA')
+        if code != 354:
+            raise smtplib.SMTPDataError(code, response)
+
+        for chunk in message.iter_chunks():
+            server.send(chunk)
+
+        code, response = server.docmd('.')
+        if code != 250:
+            raise smtplib.SMTPDataError(code, response)
+
+    def _deliver(self, email_to, message):
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                server = self._connect()
+                if isinstance(message, AttachmentMessage):
+                    self._send_stream(server, email_to, message)
+                else:
+                    server.sendmail(self.sender, email_to, message.as_string())
+                self.sent += 1
+                print(f"Email отправлен успешно на {email_to}")
+                return
+            except (smtplib.SMTPException, OSError) as e:
+                self._disconnect()
+                logging.warning(f"Попытка {attempt}/{self.max_retries} отправки email на {email_to} не удалась: {e}")
+                if attempt < self.max_retries:
+                    time.sleep(self.retry_delay * 2 ** (attempt - 1))
+
+        self.failed += 1
+        logging.error(f"Email '{message['Subject']}' на {email_to} не отправлен после {self.max_retries} попыток")
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    self._disconnect()
+                    return
+                self._deliver(*item)
+            finally:
+                self.queue.task_done()
+
+class FailureDigest:
+    # Ошибки задач одного запуска DAG копятся в файле и уходят одним письмом.
+    # Колбэки выполняются в разных процессах воркеров, поэтому общее состояние - файл на диске
+    def __init__(self, spool_dir=FAILURE_SPOOL_DIR, dispatcher=None):
+        self.spool_dir = spool_dir
+        self.dispatcher = dispatcher
+
+    def _spool_file(self, run_id):
+        safe_run_id = re.sub(r'[^A-Za-z0-9_.-]', '_', run_id)
+        return os.path.join(self.spool_dir, f"failures_{safe_run_id}.jsonl")
+
+    def record(self, run_id, dag_id, task_id, error=None):
+        os.makedirs(self.spool_dir, exist_ok=True)
+        record = {
+            'dag_id': dag_id,
+            'task_id': task_id,
+            'error': str(error) if error else None,
+            'failed_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        }
+        # Короткая строка в режиме добавления пишется атомарно даже из параллельных процессов
+        with open(self._spool_file(run_id), 'a') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def send(self, run_id, email_to):
+        spool_file = self._spool_file(run_id)
+        if not os.path.exists(spool_file):
+            return []
+
+        # Переименование до чтения: повторный вызов не отправит ту же сводку второй раз
+        sent_file = f"{spool_file}.sent"
+        os.replace(spool_file, sent_file)
+        with open(sent_file) as f:
+            failures = [json.loads(line) for line in f if line.strip()]
+
+        lines = [
+            f"- {failure['task_id']} ({failure['failed_at']}): {failure['error'] or 'см. логи задачи'}"
+            for failure in failures
+        ]
+        body = "\n".join([
+            "Ошибка в пайплайне Marketing Data Pipeline!",
+            "",
+            f"DAG: {failures[0]['dag_id']}",
+            f"Запуск: {run_id}",
+            f"Упавшие задачи ({len(failures)}):",
+            *lines,
+            "",
+            "Пожалуйста, проверьте логи для получения подробной информации.",
+        ])
+        message = MIMEText(body, "plain", "utf-8")
+        message['Subject'] = f"Ошибка в пайплайне: {len(failures)} задач(и) с ошибками"
+        (self.dispatcher or get_dispatcher()).send(email_to, message)
+        return failures
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+def get_dispatcher():
+    # Один диспетчер на процесс; перед выходом процесса очередь дописывается
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = SmtpDispatcher()
+            atexit.register(_dispatcher.close)
+        return _dispatcher
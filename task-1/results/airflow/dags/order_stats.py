@@ -0,0 +1,149 @@
+import json
+import os
+import logging
+import threading
+import pandas as pd
+
+COMPLETED_STATUS = 'completed'
+STATS_CACHE_FILE = '/opt/airflow/results/order_stats_cache.json'
+
+_memory_cache = {}
+_cache_lock = threading.Lock()
+
+def group_orders(df):
+    # Один проход groupby по статусу: все итоги и разбивки собираются из этой агрегации.
+    # Суммы копятся в float64, даже если amount загружен как float32: округление до копеек
+    # убирает погрешность представления float32 до суммирования
+    grouped = df['amount'].astype('float64').round(2).groupby(df['status'], observed=True).agg(['size', 'count', 'sum'])
+
+    return {
+        str(status): {
+            'orders': int(row['size']),
+            'amount_count': int(row['count']),
+            'amount_sum': float(row['sum']),
+        }
+        for status, row in grouped.iterrows()
+    }
+
+def merge_groups(by_status, chunk_groups):
+    # Частичные агрегаты складываются: так статистика копится по порциям или партициям
+    for status, group in chunk_groups.items():
+        total = by_status.setdefault(status, {'orders': 0, 'amount_count': 0, 'amount_sum': 0.0})
+        for field, value in group.items():
+            total[field] += value
+    return by_status
+
+def summarize_orders(df):
+    return build_stats(group_orders(df))
+
+def build_stats(by_status):
+    overall = _aggregate(by_status)
+    stats = {
+        'total_orders': overall['count'],
+        'total_revenue': overall['total_value'],
+        'avg_order_value': overall['avg_value'],
+        'by_status': by_status,
+    }
+    stats['completed_orders'] = successful_orders_summary(stats)['count']
+    stats['problem_orders'] = problem_orders_summary(stats)['count']
+    return stats
+
+def _aggregate(groups):
+    orders = sum(group['orders'] for group in groups.values())
+    amount_count = sum(group['amount_count'] for group in groups.values())
+    amount_sum = sum(group['amount_sum'] for group in groups.values())
+    # Среднее считается по заказам с заполненной суммой, как pandas mean()
+    return {
+        'count': orders,
+        'total_value': amount_sum,
+        'avg_value': amount_sum / amount_count if amount_count else 0.0,
+        'status_breakdown': {
+            status: group['orders']
+            for status, group in sorted(groups.items(), key=lambda item: -item[1]['orders'])
+        },
+    }
+
+def successful_orders_summary(stats):
+    return _aggregate({
+        status: group for status, group in stats['by_status'].items() if status == COMPLETED_STATUS
+    })
+
+def problem_orders_summary(stats):
+    return _aggregate({
+        status: group for status, group in stats['by_status'].items() if status != COMPLETED_STATUS
+    })
+
+def path_fingerprint(path):
+    if not os.path.isdir(path):
+        file_stat = os.stat(path)
+        return [os.path.abspath(path), file_stat.st_mtime_ns, file_stat.st_size]
+
+    # Партиционированный набор Parquet: ключ по самому свежему и суммарному размеру файлов
+    mtime_ns, size = 0, 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            file_stat = os.stat(os.path.join(root, name))
+            mtime_ns = max(mtime_ns, file_stat.st_mtime_ns)
+            size += file_stat.st_size
+    return [os.path.abspath(path), mtime_ns, size]
+
+def read_orders(path, columns, filters=None):
+    # Из набора Parquet читаются только нужные колонки и партиции status=..., подходящие под filters
+    if os.path.isdir(path):
+        return pd.read_parquet(path, columns=columns, filters=filters)
+    return pd.read_csv(path, usecols=columns)
+
+def _load_disk_cache():
+    if not os.path.exists(STATS_CACHE_FILE):
+        return {}
+    try:
+        with open(STATS_CACHE_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logging.warning(f"Кэш статистики заказов не прочитан: {e}")
+        return {}
+
+def _save_disk_cache(path, key, stats):
+    cache = _load_disk_cache()
+    cache[os.path.abspath(path)] = {'key': key, 'stats': stats}
+
+    # Задачи пишут кэш из разных процессов, поэтому файл подменяется атомарно
+    tmp_file = f"{STATS_CACHE_FILE}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_file, 'w') as f:
+            json.dump(cache, f, indent=2)
+        os.replace(tmp_file, STATS_CACHE_FILE)
+    except OSError as e:
+        logging.warning(f"Кэш статистики заказов не сохранен: {e}")
+
+def get_order_stats(path, filters=None):
+    # Ключ кэша - путь, mtime и размер файла: статистика пересчитывается только после его изменения.
+    # При промахе кэша filters ограничивает чтение партициями, нужными вызывающей задаче
+    key = path_fingerprint(path)
+
+    with _cache_lock:
+        cached = _memory_cache.get(key[0])
+        if cached and cached['key'] == key:
+            return cached['stats']
+
+        cached = _load_disk_cache().get(key[0])
+        if cached and cached['key'] == key:
+            _memory_cache[key[0]] = cached
+            return cached['stats']
+
+        df = read_orders(path, ['status', 'amount'], filters)
+        logging.info(f"Статистика заказов пересчитана по {path}")
+
+        stats = summarize_orders(df)
+        # Статистика части партиций не должна подменить в кэше полную
+        if filters is None:
+            _memory_cache[key[0]] = {'key': key, 'stats': stats}
+            _save_disk_cache(path, key, stats)
+        return stats
+
+def store_order_stats(path, stats):
+    # Для файлов, статистика которых посчитана при записи (например, по порциям)
+    key = path_fingerprint(path)
+    with _cache_lock:
+        _memory_cache[key[0]] = {'key': key, 'stats': stats}
+        _save_disk_cache(path, key, stats)
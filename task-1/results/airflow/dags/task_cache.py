@@ -0,0 +1,102 @@
+import functools
+import hashlib
+import inspect
+import json
+import os
+import logging
+
+from order_stats import path_fingerprint
+
+TASK_CACHE_DIR = '/opt/airflow/results/task_cache'
+# Предел размера кэша, при превышении удаляются давно не использованные записи
+TASK_CACHE_MAX_BYTES = int(os.getenv('TASK_CACHE_MAX_BYTES', str(100 * 1024 * 1024)))
+INPUT_HASHES_FILE = 'input_hashes.json'
+
+def _write_json(path, data):
+    tmp_file = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_file, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_file, path)
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def input_hash(path):
+    # sha256 содержимого входного файла; повторно файл хэшируется только после изменения
+    hashes_file = os.path.join(TASK_CACHE_DIR, INPUT_HASHES_FILE)
+    fingerprint = path_fingerprint(path)
+    hashes = _read_json(hashes_file) or {}
+
+    cached = hashes.get(fingerprint[0])
+    if cached and cached['fingerprint'] == fingerprint:
+        return cached['sha256']
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+
+    hashes[fingerprint[0]] = {'fingerprint': fingerprint, 'sha256': digest.hexdigest()}
+    _write_json(hashes_file, hashes)
+    return digest.hexdigest()
+
+def _evict():
+    entries = []
+    for name in os.listdir(TASK_CACHE_DIR):
+        if name.endswith('.json') and name != INPUT_HASHES_FILE:
+            file_stat = os.stat(os.path.join(TASK_CACHE_DIR, name))
+            entries.append((file_stat.st_mtime, file_stat.st_size, name))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, name in sorted(entries):
+        if total <= TASK_CACHE_MAX_BYTES:
+            break
+        os.remove(os.path.join(TASK_CACHE_DIR, name))
+        total -= size
+        logging.info(f"Из кэша задач удалена запись {name}")
+
+def memoize_task(input_path, outputs=(), code=(), config=None):
+    # Результат задачи переиспользуется, пока не изменились входной файл, аргументы задачи,
+    # ее код (исходник функции и модулей из code) и настройки из config, влияющие на результат.
+    # Файлы из outputs - побочные результаты задачи: запись кэша действительна, только пока
+    # они не изменились с момента сохранения
+    def decorator(func):
+        sources = [inspect.getsource(func)] + [inspect.getsource(module) for module in code]
+        code_version = hashlib.sha256("\n".join(sources).encode('utf-8')).hexdigest()
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            os.makedirs(TASK_CACHE_DIR, exist_ok=True)
+            key_source = json.dumps(
+                [input_hash(input_path), code_version, config, args, kwargs],
+                sort_keys=True,
+                default=str
+            )
+            key = hashlib.sha256(key_source.encode('utf-8')).hexdigest()[:32]
+            entry_file = os.path.join(TASK_CACHE_DIR, f"{func.__name__}-{key}.json")
+
+            entry = _read_json(entry_file)
+            if entry and all(
+                os.path.exists(path) and path_fingerprint(path) == fingerprint
+                for path, fingerprint in entry['outputs'].items()
+            ):
+                os.utime(entry_file)
+                logging.info(f"Результат {func.__name__} взят из кэша задач ({key})")
+                return entry['result']
+
+            result = func(*args, **kwargs)
+
+            _write_json(entry_file, {
+                'result': result,
+                'outputs': {path: path_fingerprint(path) for path in outputs if os.path.exists(path)},
+            })
+            _evict()
+            return result
+
+        return wrapper
+
+    return decorator
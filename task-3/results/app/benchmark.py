@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import json
+import time
+import argparse
+import pandas as pd
+from datetime import date, datetime
+
+from data_export import EXPORT_TABLES, DataExporter, TablePeakMemory, current_peak_rss_mb, logger
+
+SCALES = {
+    '10k': 10_000,
+    '1m': 1_000_000,
+    '10m': 10_000_000,
+}
+
+CITIES = [
+    'Москва', 'Санкт-Петербург', 'Казань', 'Екатеринбург',
+    'Новосибирск', 'Краснодар', 'Самара', 'Ростов-на-Дону',
+]
+
+# Все значения выводятся из номера строки g, поэтому набор данных воспроизводим без random()
+GENERATE_QUERIES = [
+    """
+    INSERT INTO drivers (first_name, last_name, license_number, phone, email, created_at)
+    SELECT
+        'Водитель' || g,
+        'Бенчмарк' || g,
+        'BDL' || lpad(g::text, 9, '0'),
+        '+7-900-' || lpad((g %% 10000000)::text, 7, '0'),
+        'driver' || g || '@bench.local',
+        %(today)s - (g %% %(days)s) * INTERVAL '1 day'
+    FROM generate_series(1, %(drivers)s) AS g
+    """,
+    """
+    INSERT INTO vehicles (license_plate, vehicle_type, capacity_kg, created_at)
+    SELECT
+        'BV' || lpad(g::text, 9, '0'),
+        (ARRAY['Грузовик', 'Фургон'])[1 + g %% 2],
+        1000 + (g * 97) %% 9000,
+        %(today)s - (g %% %(days)s) * INTERVAL '1 day'
+    FROM generate_series(1, %(vehicles)s) AS g
+    """,
+    """
+    INSERT INTO clients (company_name, contact_person, phone, email, address, created_at)
+    SELECT
+        'ООО "Клиент ' || g || '"',
+        'Контакт ' || g,
+        '+7-495-' || lpad((g %% 10000000)::text, 7, '0'),
+        'client' || g || '@bench.local',
+        (%(cities)s::text[])[1 + g %% 8] || ', ул. Тестовая, ' || g,
+        %(today)s - (g %% %(days)s) * INTERVAL '1 day'
+    FROM generate_series(1, %(clients)s) AS g
+    """,
+    """
+    INSERT INTO shipments (
+        tracking_number, origin, destination, created_at, updated_at, status, driver_id, vehicle_id, client_id
+    )
+    SELECT
+        'BENCH' || lpad(g::text, 10, '0'),
+        (%(cities)s::text[])[1 + g %% 8],
+        (%(cities)s::text[])[1 + (g * 3 + 1) %% 8],
+        created_at,
+        created_at + ((g * 104729) %% 7200) * INTERVAL '1 second',
+        (ARRAY['pending', 'in_transit', 'delivered', 'cancelled'])[1 + g %% 4],
+        1 + (g * 31) %% %(drivers)s,
+        1 + (g * 37) %% %(vehicles)s,
+        1 + (g * 41) %% %(clients)s
+    FROM generate_series(1, %(shipments)s) AS g,
+        LATERAL (
+            SELECT %(today)s - (g %% %(days)s) * INTERVAL '1 day'
+                + ((g * 7919) %% 86400) * INTERVAL '1 second' AS created_at
+        ) AS t
+    """,
+    """
+    INSERT INTO shipment_events (shipment_id, event_type, event_description, created_at, location)
+    SELECT
+        s.id,
+        (ARRAY['pickup', 'departure', 'arrival', 'delivery'])[1 + (g / %(shipments)s) %% 4],
+        'Синтетическое событие ' || g,
+        s.created_at + (1 + g / %(shipments)s) * INTERVAL '30 minutes',
+        s.origin
+    FROM generate_series(0, %(events)s - 1) AS g
+    JOIN shipments s ON s.id = 1 + g %% %(shipments)s
+    """,
+]
+
+def tables_peak_mb(exporter, table_names):
+    # Экспортер сбрасывает VmHWM перед каждой таблицей, поэтому пик фазы выгрузки - максимум пиков ее таблиц
+    peaks = [exporter.table_stats[table_name]['peak_rss_mb'] for table_name in table_names]
+    return None if None in peaks else max(peaks)
+
+def measure(name, func, peak_mb=None):
+    # Каждая фаза меряет свой пик: VmHWM сбрасывается в начале фазы, без peak_mb читается в ее конце.
+    # Пик процесса за все фазы пишется отдельно
+    tracked = TablePeakMemory.reset_peak()
+    started = time.monotonic()
+    rows = func()
+    elapsed = time.monotonic() - started
+    
+    peak = peak_mb() if peak_mb else current_peak_rss_mb() if tracked else None
+    result = {
+        'name': name,
+        'rows': rows,
+        'seconds': round(elapsed, 3),
+        'peak_rss_mb': round(peak, 1) if peak is not None else None,
+        'process_peak_rss_mb': round(TablePeakMemory.process_peak_mb(), 1),
+    }
+    logger.info(f"{name}: {rows} строк за {elapsed:.2f} с, пиковая память {result['peak_rss_mb']} МБ")
+    return result
+
+def write_results(path, results):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    
+    logger.info(f"Результаты бенчмарка сохранены: {path}")
+
+def generate(args):
+    if not args.reset:
+        raise ValueError("Генерация очищает все таблицы freight_analytics, подтвердите флагом --reset")
+    
+    shipments = SCALES[args.scale]
+    params = {
+        'today': datetime.combine(date.today(), datetime.min.time()),
+        'days': args.days,
+        'cities': CITIES,
+        'shipments': shipments,
+        'events': round(shipments * args.events_per_shipment),
+        'drivers': max(10, shipments // 1000),
+        'vehicles': max(10, shipments // 1000),
+        'clients': max(10, shipments // 200),
+    }
+    
+    exporter = DataExporter()
+    connection = exporter.connect_to_database()
+    
+    try:
+        with connection.cursor() as cursor:
+            # Синтетические данные не жалко потерять при сбое сервера
+            cursor.execute("SET synchronous_commit = off")
+            cursor.execute(
+                "TRUNCATE shipment_events, shipments, drivers, vehicles, clients RESTART IDENTITY CASCADE"
+            )
+            
+            for query in GENERATE_QUERIES:
+                started = time.monotonic()
+                cursor.execute(query, params)
+                logger.info(f"Вставлено {cursor.rowcount} строк за {time.monotonic() - started:.2f} с")
+        
+        connection.commit()
+        
+        connection.autocommit = True
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+    finally:
+        connection.close()
+    
+    logger.info(
+        f"Сгенерирован набор {args.scale}: {params['shipments']} перевозок, "
+        f"{params['events']} событий за {args.days} дней"
+    )
+
+def compare_with_baseline(results, baseline_path, max_regression):
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f)
+    
+    regressions = []
+    for table_name, stats in results['tables'].items():
+        baseline_stats = baseline['tables'].get(table_name)
+        if not baseline_stats or not baseline_stats['rows_per_sec']:
+            continue
+        
+        change = stats['rows_per_sec'] / baseline_stats['rows_per_sec'] - 1
+        logger.info(f"{table_name}: {change * 100:+.1f}% строк/с относительно {baseline_path}")
+        if change < -max_regression:
+            regressions.append(table_name)
+    
+    return regressions
+
+def run(args):
+    # Обычный запуск выгружает перевозки и события только за текущий день, а набор распределен
+    # по --days дням. Полная выгрузка инкрементального режима без водяных знаков читает таблицы
+    # целиком; shipments_wide (EXPORT_WIDE_SHIPMENTS) по-прежнему выгружается за текущий день
+    os.environ['EXPORT_MODE'] = 'incremental'
+    exporter = DataExporter(force_full=True)
+    connection = exporter.connect_to_database()
+    
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*), MIN(created_at), MAX(created_at) FROM shipments")
+            shipments, first_created, last_created = cursor.fetchone()
+            cursor.execute("SELECT COUNT(*) FROM shipment_events")
+            events = cursor.fetchone()[0]
+        
+        for _, export in exporter._table_exporters():
+            export(connection)
+    finally:
+        connection.close()
+    
+    tables = {}
+    for table_name, stats in exporter.table_stats.items():
+        seconds = stats['seconds']
+        tables[table_name] = {
+            'engine': stats['engine'],
+            'rows': stats['rows'],
+            'bytes': stats['bytes'],
+            'seconds': round(seconds, 3),
+            'db_seconds': round(stats['db_seconds'], 3),
+            'serialize_seconds': round(stats['serialize_seconds'], 3),
+            'write_seconds': round(stats['write_seconds'], 3),
+            'rows_per_sec': round(stats['rows'] / seconds, 1) if seconds > 0 else 0,
+            'mb_per_sec': round(stats['bytes'] / (1024 * 1024) / seconds, 3) if seconds > 0 else 0,
+            'peak_rss_mb': round(stats['peak_rss_mb'], 1) if stats['peak_rss_mb'] is not None else None,
+        }
+    
+    results = {
+        'label': args.label,
+        'generated_at': datetime.now().isoformat(),
+        'dataset': {
+            'shipments': shipments,
+            'shipment_events': events,
+            'created_from': first_created.isoformat() if first_created else None,
+            'created_to': last_created.isoformat() if last_created else None,
+        },
+        'config': {
+            'engines': exporter.table_engines,
+            'format': exporter.output_format,
+            'compression': exporter.output_options['compression'],
+            'fetch_size': exporter.fetch_size,
+        },
+        'tables': tables,
+    }
+    write_results(args.output, results)
+    
+    if args.baseline:
+        regressions = compare_with_baseline(results, args.baseline, args.max_regression)
+        if regressions:
+            raise RuntimeError(f"Регрессия производительности: {', '.join(regressions)}")
+
+def export_five_files(exporter, connection):
+    exports = [
+        exporter.export_shipments,
+        exporter.export_shipment_events,
+        exporter.export_drivers,
+        exporter.export_vehicles,
+        exporter.export_clients,
+    ]
+    return sum(export(connection) for export in exports)
+
+def consume_five_files(exporter, day):
+    # Так потребители собирают широкую таблицу сейчас: четыре merge и подсчет событий
+    shipments = pd.read_csv(exporter._output_path('shipments', day))
+    events = pd.read_csv(exporter._output_path('shipment_events', day))
+    drivers = pd.read_csv(exporter._output_path('drivers', day)).add_prefix('driver_')
+    vehicles = pd.read_csv(exporter._output_path('vehicles', day)).add_prefix('vehicle_')
+    clients = pd.read_csv(exporter._output_path('clients', day)).add_prefix('client_')
+    
+    event_counts = events.groupby('shipment_id').size().rename('event_count')
+    wide = (
+        shipments
+        .merge(drivers, how='left', on='driver_id')
+        .merge(vehicles, how='left', on='vehicle_id')
+        .merge(clients, how='left', on='client_id')
+        .merge(event_counts, how='left', left_on='id', right_index=True)
+    )
+    return len(wide)
+
+def consume_wide_file(exporter, day):
+    return len(pd.read_csv(exporter._output_path('shipments_wide', day)))
+
+def wide(args):
+    # Сравнение сопоставимо только на несжатых csv без ротации
+    os.environ['EXPORT_FORMAT'] = 'csv'
+    os.environ['EXPORT_COMPRESSION'] = 'none'
+    os.environ['EXPORT_ROTATE_ROWS'] = '0'
+    os.environ['EXPORT_ROTATE_BYTES'] = '0'
+    
+    exporter = DataExporter()
+    today = date.today()
+    connection = exporter.connect_to_database()
+    
+    try:
+        results = [
+            measure(
+                'five_files_export',
+                lambda: export_five_files(exporter, connection),
+                lambda: tables_peak_mb(exporter, EXPORT_TABLES)
+            ),
+            measure('five_files_consume', lambda: consume_five_files(exporter, today)),
+            measure(
+                'wide_export',
+                lambda: exporter.export_wide_shipments(connection),
+                lambda: tables_peak_mb(exporter, ['shipments_wide'])
+            ),
+            measure('wide_consume', lambda: consume_wide_file(exporter, today)),
+        ]
+    finally:
+        connection.close()
+    
+    write_results(args.output, results)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Бенчмарк экспорта freight_analytics')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    generate_parser = subparsers.add_parser('generate', help='Сгенерировать синтетический набор данных')
+    generate_parser.add_argument('--scale', choices=SCALES.keys(), default='10k')
+    generate_parser.add_argument('--events-per-shipment', type=float, default=3.0)
+    generate_parser.add_argument('--days', type=int, default=30, help='На сколько дней распределить перевозки')
+    generate_parser.add_argument('--reset', action='store_true', help='Подтверждение очистки таблиц')
+    generate_parser.set_defaults(func=generate)
+    
+    run_parser = subparsers.add_parser('run', help='Замерить экспорт каждой таблицы')
+    run_parser.add_argument('--label', default='local', help='Метка версии в файле результатов')
+    run_parser.add_argument('--output', default='benchmark_results.json')
+    run_parser.add_argument('--baseline', help='Файл результатов предыдущей версии для сравнения')
+    run_parser.add_argument('--max-regression', type=float, default=0.2, help='Допустимое падение строк/с (доля)')
+    run_parser.set_defaults(func=run)
+    
+    wide_parser = subparsers.add_parser('wide', help='Сравнить пять файлов и денормализованную выгрузку')
+    wide_parser.add_argument('--output', default='benchmark_wide.json')
+    wide_parser.set_defaults(func=wide)
+    
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        logger.error(f"Бенчмарк завершился с ошибкой: {e}")
+        sys.exit(1)
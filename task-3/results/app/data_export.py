@@ -1,11 +1,24 @@
 #!/usr/bin/env python3
 
+import io
 import os
 import sys
+import csv
+import glob
+import gzip
+import json
+import time
+import hashlib
+import argparse
+import threading
+import resource
 import logging
+import urllib.request
 import pandas as pd
 import psycopg2
-from datetime import date
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
+from psycopg2 import extensions, pool
 from dotenv import load_dotenv
 
 logging.basicConfig(
@@ -17,8 +30,515 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+EXPORT_ENGINES = ('pandas', 'stream', 'copy')
+EXPORT_TABLES = ('shipments', 'shipment_events', 'drivers', 'vehicles', 'clients')
+EXPORT_MODES = ('full', 'incremental')
+
+# Колонки выгрузок с типами из init-db.sql, по ним строятся схемы Parquet/Arrow
+TABLE_SCHEMAS = {
+    'shipments': [
+        ('id', 'BIGINT'),
+        ('tracking_number', 'VARCHAR'),
+        ('origin', 'VARCHAR'),
+        ('destination', 'VARCHAR'),
+        ('created_at', 'TIMESTAMP'),
+        ('updated_at', 'TIMESTAMP'),
+        ('status', 'VARCHAR'),
+        ('driver_id', 'BIGINT'),
+        ('vehicle_id', 'BIGINT'),
+        ('client_id', 'BIGINT'),
+    ],
+    'shipment_events': [
+        ('id', 'BIGINT'),
+        ('shipment_id', 'BIGINT'),
+        ('event_type', 'VARCHAR'),
+        ('event_description', 'TEXT'),
+        ('created_at', 'TIMESTAMP'),
+        ('location', 'VARCHAR'),
+        ('tracking_number', 'VARCHAR'),
+    ],
+    'drivers': [
+        ('id', 'BIGINT'),
+        ('first_name', 'VARCHAR'),
+        ('last_name', 'VARCHAR'),
+        ('license_number', 'VARCHAR'),
+        ('phone', 'VARCHAR'),
+        ('email', 'VARCHAR'),
+        ('created_at', 'TIMESTAMP'),
+    ],
+    'vehicles': [
+        ('id', 'BIGINT'),
+        ('license_plate', 'VARCHAR'),
+        ('vehicle_type', 'VARCHAR'),
+        ('capacity_kg', 'INTEGER'),
+        ('created_at', 'TIMESTAMP'),
+    ],
+    'clients': [
+        ('id', 'BIGINT'),
+        ('company_name', 'VARCHAR'),
+        ('contact_person', 'VARCHAR'),
+        ('phone', 'VARCHAR'),
+        ('email', 'VARCHAR'),
+        ('address', 'TEXT'),
+        ('created_at', 'TIMESTAMP'),
+    ],
+}
+
+# Денормализованная выгрузка: перевозка с атрибутами водителя, транспорта, клиента и числом событий
+TABLE_SCHEMAS['shipments_wide'] = TABLE_SCHEMAS['shipments'] + [
+    ('driver_first_name', 'VARCHAR'),
+    ('driver_last_name', 'VARCHAR'),
+    ('driver_license_number', 'VARCHAR'),
+    ('driver_phone', 'VARCHAR'),
+    ('vehicle_license_plate', 'VARCHAR'),
+    ('vehicle_type', 'VARCHAR'),
+    ('vehicle_capacity_kg', 'INTEGER'),
+    ('client_company_name', 'VARCHAR'),
+    ('client_contact_person', 'VARCHAR'),
+    ('client_phone', 'VARCHAR'),
+    ('client_email', 'VARCHAR'),
+    ('event_count', 'BIGINT'),
+]
+
+WIDE_LOOKUP_QUERIES = {
+    'drivers': "SELECT id, first_name, last_name, license_number, phone FROM drivers",
+    'vehicles': "SELECT id, license_plate, vehicle_type, capacity_kg FROM vehicles",
+    'clients': "SELECT id, company_name, contact_person, phone, email FROM clients",
+}
+
+# Уникальный порядок строк выгрузки: после сбоя таблица дочитывается со строк, следующих
+# за ключом последней закрытой части
+RESUME_KEYS = {
+    'shipments': ('created_at', 'id'),
+    'shipment_events': ('created_at', 'id'),
+    'drivers': ('created_at', 'id'),
+    'vehicles': ('created_at', 'id'),
+    'clients': ('created_at', 'id'),
+    'shipments_wide': ('id',),
+}
+
+def journal_value(value):
+    # Значения ключа из psycopg2 и pandas приводятся к виду, пригодному для JSON и параметров запроса
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if hasattr(value, 'item'):
+        return value.item()
+    return value
+
+def merge_event_counts(shipments, event_counts):
+    # Оба потока отсортированы по id перевозки, поэтому счетчики подтягиваются за один проход
+    counts = iter(event_counts)
+    current = next(counts, None)
+    
+    for shipment in shipments:
+        while current is not None and current[0] < shipment[0]:
+            current = next(counts, None)
+        
+        if current is not None and current[0] == shipment[0]:
+            yield shipment, current[1]
+        else:
+            yield shipment, 0
+
+def iter_cursor(cursor, fetch_size, timings):
+    # Время ожидания порций от БД учитывается отдельно от обработки и записи
+    while True:
+        started = time.monotonic()
+        batch = cursor.fetchmany(fetch_size)
+        timings['db_seconds'] += time.monotonic() - started
+        if not batch:
+            return
+        yield from batch
+
+def build_wide_row(shipment, event_count, lookups):
+    # Колонки shipments: ..., driver_id, vehicle_id, client_id - последние три
+    driver_id, vehicle_id, client_id = shipment[-3:]
+    driver = lookups['drivers'].get(driver_id, (None,) * 4)
+    vehicle = lookups['vehicles'].get(vehicle_id, (None,) * 3)
+    client = lookups['clients'].get(client_id, (None,) * 4)
+    return tuple(shipment) + driver + vehicle + client + (event_count,)
+
+def arrow_schema(columns):
+    import pyarrow as pa
+    
+    sql_to_arrow = {
+        'BIGINT': pa.int64(),
+        'INTEGER': pa.int32(),
+        'VARCHAR': pa.string(),
+        'TEXT': pa.string(),
+        'TIMESTAMP': pa.timestamp('us'),
+    }
+    return pa.schema([(name, sql_to_arrow[sql_type]) for name, sql_type in columns])
+
+COMPRESSION_EXTENSIONS = {
+    'none': '',
+    'gzip': '.gz',
+    'zstd': '.zst',
+}
+
+class CsvOutput:
+    extension = 'csv'
+    
+    def __init__(self, filepath, columns, options, timings, header=True):
+        self.timings = timings
+        self.raw = open(filepath, 'wb')
+        compression = options['compression']
+        if compression == 'gzip':
+            self.binary = gzip.GzipFile(fileobj=self.raw, mode='wb')
+        elif compression == 'zstd':
+            import zstandard
+            self.binary = zstandard.ZstdCompressor().stream_writer(self.raw, closefd=False)
+        else:
+            self.binary = self.raw
+        
+        if header:
+            self.write_rows([[name for name, _ in columns]])
+    
+    def _write(self, text, started):
+        # Сериализация порции в строку и запись (со сжатием) замеряются раздельно
+        data = text.encode('utf-8')
+        written = time.monotonic()
+        self.timings['serialize_seconds'] += written - started
+        self.binary.write(data)
+        self.timings['write_seconds'] += time.monotonic() - written
+    
+    def write_rows(self, rows):
+        started = time.monotonic()
+        buffer = io.StringIO()
+        csv.writer(buffer, lineterminator='\n').writerows(rows)
+        self._write(buffer.getvalue(), started)
+    
+    def write_dataframe(self, df):
+        started = time.monotonic()
+        self._write(df.to_csv(index=False, header=False), started)
+    
+    def bytes_written(self):
+        return self.raw.tell()
+    
+    def close(self):
+        if self.binary is not self.raw:
+            self.binary.close()
+        self.raw.close()
+
+class ArrowOutput:
+    extension = 'arrow'
+    
+    def __init__(self, filepath, columns, options, timings):
+        import pyarrow as pa
+        
+        self.pa = pa
+        self.timings = timings
+        self.schema = arrow_schema(columns)
+        self.sink = pa.OSFile(filepath, 'wb')
+        self.writer = pa.ipc.new_file(self.sink, self.schema)
+    
+    def bytes_written(self):
+        return self.sink.tell()
+    
+    def _to_table(self, rows):
+        columns = list(zip(*rows)) if rows else [[] for _ in self.schema]
+        arrays = [
+            self.pa.array(values, type=field.type)
+            for values, field in zip(columns, self.schema)
+        ]
+        return self.pa.Table.from_arrays(arrays, schema=self.schema)
+    
+    def _write_table(self, table):
+        self.writer.write_table(table)
+    
+    def _write(self, table, started):
+        written = time.monotonic()
+        self.timings['serialize_seconds'] += written - started
+        self._write_table(table)
+        self.timings['write_seconds'] += time.monotonic() - written
+    
+    def write_rows(self, rows):
+        started = time.monotonic()
+        self._write(self._to_table(rows), started)
+    
+    def write_dataframe(self, df):
+        started = time.monotonic()
+        self._write(self.pa.Table.from_pandas(df, schema=self.schema, preserve_index=False), started)
+    
+    def close(self):
+        self.writer.close()
+        self.sink.close()
+
+class ParquetOutput(ArrowOutput):
+    extension = 'parquet'
+    
+    def __init__(self, filepath, columns, options, timings):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        
+        self.pa = pa
+        self.timings = timings
+        self.schema = arrow_schema(columns)
+        self.row_group_size = options['parquet_row_group_size']
+        self.sink = pa.OSFile(filepath, 'wb')
+        self.writer = pq.ParquetWriter(self.sink, self.schema, compression=options['parquet_compression'])
+        # Порции курсора копятся до размера row group, чтобы не плодить мелкие группы
+        self.pending = []
+        self.pending_rows = 0
+    
+    def _write_table(self, table):
+        self.pending.append(table)
+        self.pending_rows += table.num_rows
+        if self.pending_rows >= self.row_group_size:
+            self._flush()
+    
+    def _flush(self):
+        if self.pending_rows:
+            self.writer.write_table(self.pa.concat_tables(self.pending), row_group_size=self.row_group_size)
+        self.pending = []
+        self.pending_rows = 0
+    
+    def close(self):
+        started = time.monotonic()
+        self._flush()
+        self.timings['write_seconds'] += time.monotonic() - started
+        self.writer.close()
+        self.sink.close()
+
+OUTPUT_FORMATS = {
+    'csv': CsvOutput,
+    'parquet': ParquetOutput,
+    'arrow': ArrowOutput,
+}
+
+def current_peak_rss_mb():
+    # VmHWM - пик RSS с последнего сброса через clear_refs, без /proc остается ru_maxrss (в Linux в килобайтах)
+    try:
+        with open('/proc/self/status', encoding='ascii') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+class TablePeakMemory:
+    # Пик памяти за время выгрузки таблицы: VmHWM процесса сбрасывается, когда начинается выгрузка
+    # и других в этот момент нет. Память у потоков общая, поэтому у таблиц, выгружавшихся
+    # одновременно (параллельный режим, backfill), это пик процесса с начала группы одновременных
+    # выгрузок, а в shared_with перечислены таблицы, с которыми выгрузка пересеклась
+    lock = threading.Lock()
+    active = set()
+    # Сброс VmHWM обнуляет и ru_maxrss, поэтому пик процесса копится отдельно
+    process_peak = 0.0
+    # False - сброс VmHWM недоступен (нет /proc), пик за выгрузку не измерить
+    tracked = False
+    
+    def __init__(self, table_name):
+        self.table_name = table_name
+        self.shared_with = set()
+    
+    def __enter__(self):
+        with self.lock:
+            if not self.active:
+                TablePeakMemory.tracked = self._reset()
+            for other in self.active:
+                other.shared_with.add(self.table_name)
+                self.shared_with.add(other.table_name)
+            self.active.add(self)
+        return self
+    
+    def __exit__(self, *exc_info):
+        with self.lock:
+            self.active.discard(self)
+    
+    @classmethod
+    def _reset(cls):
+        cls.process_peak = max(cls.process_peak, current_peak_rss_mb())
+        try:
+            with open('/proc/self/clear_refs', 'w', encoding='ascii') as f:
+                f.write('5')
+        except OSError:
+            return False
+        return True
+    
+    @classmethod
+    def reset_peak(cls):
+        # Начало замера вне выгрузок таблиц, например фазы бенчмарка
+        with cls.lock:
+            if not cls.active:
+                cls.tracked = cls._reset()
+            return cls.tracked
+    
+    @classmethod
+    def process_peak_mb(cls):
+        with cls.lock:
+            return max(cls.process_peak, current_peak_rss_mb())
+    
+    def peak_mb(self):
+        # None - сброс VmHWM недоступен
+        with self.lock:
+            return current_peak_rss_mb() if self.tracked else None
+
+def describe_peak(peak_mb, shared_with):
+    if peak_mb is None:
+        return "пиковая память не измерена"
+    if shared_with:
+        return f"пиковая память процесса {peak_mb:.1f} МБ (одновременно с {', '.join(shared_with)})"
+    return f"пиковая память {peak_mb:.1f} МБ"
+
+def new_timings():
+    # db - ожидание данных от PostgreSQL, serialize - преобразование строк в формат файла,
+    # write - запись на диск вместе со сжатием и подсчетом контрольных сумм
+    return {'db_seconds': 0.0, 'serialize_seconds': 0.0, 'write_seconds': 0.0}
+
+def render_prometheus(summary):
+    lines = []
+    
+    def metric(name, help_text, metric_type, samples):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for labels, value in samples:
+            label_text = ",".join(f'{key}="{label}"' for key, label in labels.items())
+            lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+    
+    tables = summary['tables']
+    metric('data_export_last_run_success', 'Успешность последнего запуска (1 - успех)', 'gauge',
+           [({}, int(summary['success']))])
+    metric('data_export_last_run_timestamp_seconds', 'Время завершения последнего запуска', 'gauge',
+           [({}, summary['finished_at_epoch'])])
+    metric('data_export_run_duration_seconds', 'Длительность запуска экспорта', 'gauge',
+           [({}, round(summary['duration_seconds'], 3))])
+    if summary['deadline_seconds']:
+        metric('data_export_deadline_seconds', 'Бюджет времени задания (activeDeadlineSeconds)', 'gauge',
+               [({}, summary['deadline_seconds'])])
+    metric('data_export_peak_rss_bytes', 'Пиковая память процесса за весь запуск', 'gauge',
+           [({}, int(summary['peak_rss_mb'] * 1024 * 1024))])
+    metric('data_export_rows', 'Количество выгруженных строк', 'gauge',
+           [({'table': name}, stats['rows']) for name, stats in tables.items()])
+    metric('data_export_bytes', 'Размер файлов выгрузки', 'gauge',
+           [({'table': name}, stats['bytes']) for name, stats in tables.items()])
+    metric('data_export_table_duration_seconds', 'Длительность выгрузки таблицы', 'gauge',
+           [({'table': name}, round(stats['seconds'], 3)) for name, stats in tables.items()])
+    metric('data_export_phase_seconds', 'Время выгрузки таблицы по этапам', 'gauge',
+           [
+               ({'table': name, 'phase': phase}, round(stats[f'{key}_seconds'], 3))
+               for name, stats in tables.items()
+               for phase, key in (('query', 'db'), ('serialize', 'serialize'), ('write', 'write'))
+           ])
+    # scope="process" - таблица выгружалась одновременно с другими, значение - пик процесса за это время
+    metric('data_export_table_peak_rss_bytes', 'Пиковая память за время выгрузки таблицы', 'gauge',
+           [
+               (
+                   {'table': name, 'scope': 'process' if stats.get('peak_rss_shared_with') else 'table'},
+                   int(stats['peak_rss_mb'] * 1024 * 1024)
+               )
+               for name, stats in tables.items()
+               if stats['peak_rss_mb'] is not None
+           ])
+    
+    return "\n".join(lines) + "\n"
+
+def describe_part(filepath, rows):
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    
+    return {
+        'file': os.path.basename(filepath),
+        'rows': rows,
+        'bytes': os.path.getsize(filepath),
+        'sha256': digest.hexdigest(),
+    }
+
+class RotatingOutput:
+    # Делит выгрузку таблицы на части <stem>.part-NNNN.<ext> по числу строк или размеру файла
+    def __init__(self, filepath, extension, output_class, columns, options, timings,
+                 committed_parts=(), key_columns=(), checkpoint=None):
+        self.filepath = filepath
+        self.timings = timings
+        self.stem = filepath[:-len(extension) - 1]
+        self.extension = extension
+        self.output_class = output_class
+        self.columns = columns
+        self.options = options
+        self.max_rows = options['rotate_rows']
+        self.max_bytes = options['rotate_bytes']
+        self.rotation = self.max_rows > 0 or self.max_bytes > 0
+        # Части, уже зафиксированные в журнале прерванной попытки, сохраняются, нумерация продолжается
+        self.parts = list(committed_parts)
+        names = [name for name, _ in columns]
+        self.key_indexes = [names.index(name) for name in key_columns]
+        self.checkpoint = checkpoint
+        self.last_key = None
+        
+        if self.rotation:
+            # Части прошлого запуска за ту же дату не должны смешиваться с новыми
+            committed = {part['file'] for part in self.parts}
+            for stale_path in glob.glob(f"{glob.escape(self.stem)}.part-*.{self.extension}*"):
+                if os.path.basename(stale_path) not in committed:
+                    os.remove(stale_path)
+        
+        self._open_part()
+    
+    def _open_part(self):
+        if self.rotation:
+            self.current_path = f"{self.stem}.part-{len(self.parts) + 1:04d}.{self.extension}"
+        else:
+            self.current_path = self.filepath
+        # Файл пишется под временным именем и появляется под итоговым только целиком
+        self.current = self.output_class(f"{self.current_path}.tmp", self.columns, self.options, self.timings)
+        self.current_rows = 0
+    
+    def _close_part(self):
+        self.current.close()
+        os.replace(f"{self.current_path}.tmp", self.current_path)
+        # Подсчет контрольной суммы перечитывает файл, поэтому относится к этапу записи
+        started = time.monotonic()
+        self.parts.append(describe_part(self.current_path, self.current_rows))
+        self.timings['write_seconds'] += time.monotonic() - started
+    
+    def _rotate_if_full(self):
+        rows_full = self.max_rows and self.current_rows >= self.max_rows
+        bytes_full = self.max_bytes and self.current.bytes_written() >= self.max_bytes
+        if rows_full or bytes_full:
+            self._close_part()
+            if self.checkpoint:
+                self.checkpoint(self.parts, self.last_key)
+            self._open_part()
+    
+    def _chunk_end(self, start, total):
+        # Порция может пересечь границу части, поэтому режем ее по остатку лимита строк
+        if not self.max_rows:
+            return total
+        return min(total, start + self.max_rows - self.current_rows)
+    
+    def write_rows(self, rows):
+        start = 0
+        while start < len(rows):
+            self._rotate_if_full()
+            end = self._chunk_end(start, len(rows))
+            self.current.write_rows(rows[start:end])
+            self.current_rows += end - start
+            self.last_key = [rows[end - 1][i] for i in self.key_indexes]
+            start = end
+    
+    def write_dataframe(self, df):
+        start = 0
+        while start < len(df):
+            self._rotate_if_full()
+            end = self._chunk_end(start, len(df))
+            self.current.write_dataframe(df.iloc[start:end])
+            self.current_rows += end - start
+            self.last_key = [df.iat[end - 1, i] for i in self.key_indexes]
+            start = end
+    
+    def close(self):
+        self._close_part()
+        return self.parts
+    
+    def abort(self):
+        # Недописанная часть не должна появиться под итоговым именем
+        self.current.close()
+        os.remove(f"{self.current_path}.tmp")
+
 class DataExporter:
-    def __init__(self):
+    def __init__(self, force_full=False, explain=False, resume=True):
         load_dotenv()
         
         self.db_config = {
@@ -32,6 +552,79 @@ class DataExporter:
         self.export_dir = os.getenv('EXPORT_DATA_DIRECTORY', '/app/data')
         os.makedirs(self.export_dir, exist_ok=True)
         
+        # pandas - вся выборка в DataFrame, stream - серверный курсор с выгрузкой порциями,
+        # copy - COPY ... TO STDOUT прямо в файл без построчной обработки в Python.
+        # Движок можно переопределить для отдельной таблицы: EXPORT_ENGINE_SHIPMENTS=copy
+        self.export_engine = os.getenv('EXPORT_ENGINE', 'pandas')
+        self.fetch_size = int(os.getenv('EXPORT_FETCH_SIZE', '10000'))
+        self.table_engines = {
+            table_name: os.getenv(f'EXPORT_ENGINE_{table_name.upper()}', self.export_engine)
+            for table_name in EXPORT_TABLES
+        }
+        for table_name, engine in self.table_engines.items():
+            if engine not in EXPORT_ENGINES:
+                raise ValueError(f"Неизвестный движок экспорта для {table_name}: {engine}")
+        
+        # Формат файлов выгрузки: csv, parquet или arrow (Arrow IPC)
+        self.output_format = os.getenv('EXPORT_FORMAT', 'csv')
+        if self.output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Неизвестный формат экспорта: {self.output_format}")
+        if self.output_format != 'csv' and 'copy' in self.table_engines.values():
+            raise ValueError("Движок copy поддерживает только формат csv")
+        # Потоковое сжатие csv (none, gzip, zstd) и ротация файлов по строкам/байтам, 0 - без ротации
+        self.output_options = {
+            'parquet_compression': os.getenv('EXPORT_PARQUET_COMPRESSION', 'zstd'),
+            'parquet_row_group_size': int(os.getenv('EXPORT_PARQUET_ROW_GROUP_SIZE', '100000')),
+            'compression': os.getenv('EXPORT_COMPRESSION', 'none'),
+            'rotate_rows': int(os.getenv('EXPORT_ROTATE_ROWS', '0')),
+            'rotate_bytes': int(os.getenv('EXPORT_ROTATE_BYTES', '0')),
+        }
+        if self.output_options['compression'] not in COMPRESSION_EXTENSIONS:
+            raise ValueError(f"Неизвестный тип сжатия: {self.output_options['compression']}")
+        if self.output_options['compression'] != 'none' and self.output_format != 'csv':
+            raise ValueError("EXPORT_COMPRESSION поддерживается только для csv, для parquet используйте EXPORT_PARQUET_COMPRESSION")
+        # COPY пишет таблицу одним потоком в один файл, поэтому ротация и дочитывание таблицы
+        # по журналу для него недоступны
+        rotation = self.output_options['rotate_rows'] > 0 or self.output_options['rotate_bytes'] > 0
+        if rotation and 'copy' in self.table_engines.values():
+            raise ValueError("Движок copy не поддерживает ротацию файлов EXPORT_ROTATE_ROWS/EXPORT_ROTATE_BYTES")
+        self.manifest = {}
+        self.table_stats = {}
+        
+        # Метрики запуска: textfile для node_exporter и/или Pushgateway, сводка JSON пишется всегда
+        self.metrics_textfile = os.getenv('EXPORT_METRICS_TEXTFILE')
+        self.pushgateway_url = os.getenv('EXPORT_PUSHGATEWAY_URL')
+        self.deadline_seconds = int(os.getenv('EXPORT_DEADLINE_SECONDS', '0'))
+        
+        # Дополнительная денормализованная выгрузка shipments_wide за текущий день
+        self.wide_shipments = os.getenv('EXPORT_WIDE_SHIPMENTS', 'false').lower() == 'true'
+        
+        # Больше одного воркера - таблицы выгружаются параллельно из общего снимка БД
+        self.parallel_workers = int(os.getenv('EXPORT_PARALLEL_WORKERS', '1'))
+        # Backfill: сколько дней выгружается одновременно, столько же соединений с БД
+        self.backfill_workers = int(os.getenv('EXPORT_BACKFILL_WORKERS', '4'))
+        
+        # incremental - выгружаются только строки новее сохраненного водяного знака таблицы
+        self.export_mode = os.getenv('EXPORT_MODE', 'full')
+        if self.export_mode not in EXPORT_MODES:
+            raise ValueError(f"Неизвестный режим экспорта: {self.export_mode}")
+        self.incremental = self.export_mode == 'incremental'
+        self.force_full = force_full or os.getenv('EXPORT_FORCE_FULL', 'false').lower() == 'true'
+        self.state_file = os.path.join(self.export_dir, 'export_state.json')
+        self.state_lock = threading.Lock()
+        self.watermarks = self._load_watermarks() if self.incremental else {}
+        self.pending_watermarks = {}
+        
+        # Диагностика: план каждого запроса выгрузки через EXPLAIN (ANALYZE, BUFFERS)
+        self.explain = explain
+        
+        # Журнал запуска: повтор CronJob пропускает выгруженные таблицы и дочитывает прерванные.
+        # Ведется только внутри run_export, EXPORT_RESUME=false или --restart начинают с нуля
+        self.resume = resume and os.getenv('EXPORT_RESUME', 'true').lower() == 'true'
+        self.journal_path = None
+        self.journal = {'tables': {}}
+        self.resumed_records = 0
+        
     def connect_to_database(self):
         try:
             connection = psycopg2.connect(**self.db_config)
@@ -41,15 +634,396 @@ class DataExporter:
             logger.error(f"Ошибка подключения к базе данных: {e}")
             raise
     
-    def export_shipments(self, connection):
-        today = date.today()
-        filename = f"shipments_{today.strftime('%Y-%m-%d')}.csv"
-        filepath = os.path.join(self.export_dir, filename)
+    def _export_query(self, connection, table_name, query, params, filepath):
+        engine = self.table_engines[table_name]
+        if self.explain:
+            self._explain_query(connection, table_name, query, params)
+        
+        with TablePeakMemory(table_name) as memory:
+            started = time.monotonic()
+            timings = new_timings()
+            
+            if engine == 'copy':
+                rows = self._copy_query_to_csv(connection, table_name, query, params, filepath, timings)
+                # COPY отдает данные и пишет файл одновременно, разделить эти этапы нельзя
+                timings['db_seconds'] = time.monotonic() - started
+                parts = [describe_part(filepath, rows)]
+            else:
+                committed_parts, key = self._resume_point(table_name)
+                if key is not None:
+                    query, params = self._resume_query(table_name, query, params, key)
+            
+                output = self._open_output(table_name, filepath, timings, committed_parts)
+                try:
+                    if engine == 'stream':
+                        rows = self._stream_query(connection, table_name, query, params, output, timings)
+                    else:
+                        df = pd.read_sql_query(query, connection, params=params)
+                        timings['db_seconds'] = time.monotonic() - started
+                        output.write_dataframe(df)
+                        rows = len(df)
+                except Exception:
+                    output.abort()
+                    raise
+                parts = output.close()
+                rows += sum(part['rows'] for part in committed_parts)
+            
+            self._record_table(table_name, engine, rows, parts, started, timings, memory)
+        return rows
+    
+    def _open_output(self, table_name, filepath, timings, committed_parts=()):
+        return RotatingOutput(
+            filepath,
+            self._output_extension(),
+            OUTPUT_FORMATS[self.output_format],
+            TABLE_SCHEMAS[table_name],
+            self.output_options,
+            timings,
+            committed_parts,
+            RESUME_KEYS[table_name],
+            lambda parts, key: self._checkpoint_table(table_name, parts, key)
+        )
+    
+    def _resume_query(self, table_name, query, params, key):
+        # Условие по ключу накладывается снаружи, PostgreSQL опускает его внутрь подзапроса
+        columns = ", ".join(RESUME_KEYS[table_name])
+        placeholders = ", ".join(['%s'] * len(key))
+        resumed_query = f"""
+            SELECT * FROM ({query}) AS resumed
+            WHERE ({columns}) > ({placeholders})
+            ORDER BY {columns}
+        """
+        return resumed_query, list(params or []) + list(key)
+    
+    def _record_table(self, table_name, engine, rows, parts, started, timings, memory):
+        elapsed = time.monotonic() - started
+        rate = rows / elapsed if elapsed > 0 else 0
+        size_bytes = sum(part['bytes'] for part in parts)
+        size_mb = size_bytes / (1024 * 1024)
+        peak_mb = memory.peak_mb()
+        shared_with = sorted(memory.shared_with)
+        
+        with self.state_lock:
+            self.manifest[table_name] = {'rows': rows, 'parts': parts}
+            self.table_stats[table_name] = stats = {
+                'engine': engine,
+                'rows': rows,
+                'bytes': size_bytes,
+                'seconds': elapsed,
+                'db_seconds': timings['db_seconds'],
+                'serialize_seconds': timings['serialize_seconds'],
+                'write_seconds': timings['write_seconds'],
+                'peak_rss_mb': peak_mb,
+                'peak_rss_shared_with': shared_with,
+            }
+            high = self.pending_watermarks.get(table_name)
+        entry = {'status': 'done', 'manifest': self.manifest[table_name], 'stats': stats}
+        if high is not None:
+            # Водяной знак сдвинется только в конце запуска, повтор должен его восстановить
+            entry['watermark'] = high.isoformat()
+        self._journal_table(table_name, entry)
+        
+        logger.info(
+            f"Таблица {table_name} ({engine}): {rows} строк за {elapsed:.2f} с "
+            f"(БД {timings['db_seconds']:.2f} с, сериализация {timings['serialize_seconds']:.2f} с, "
+            f"запись {timings['write_seconds']:.2f} с), {rate:.0f} строк/с, "
+            f"{size_mb:.1f} МБ в {len(parts)} файлах, {describe_peak(peak_mb, shared_with)}"
+        )
+    
+    def _explain_query(self, connection, table_name, query, params):
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS) {query}", params)
+            plan = "\n".join(row[0] for row in cursor.fetchall())
+        
+        logger.info(f"План запроса {table_name}:\n{plan}")
+    
+    def _stream_query(self, connection, table_name, query, params, output, timings):
+        rows = 0
+        
+        # Именованный курсор живет на стороне сервера, клиент держит в памяти только одну порцию
+        with connection.cursor(name=f"export_{table_name}") as cursor:
+            cursor.itersize = self.fetch_size
+            started = time.monotonic()
+            cursor.execute(query, params)
+            batch = cursor.fetchmany(self.fetch_size)
+            timings['db_seconds'] += time.monotonic() - started
+            
+            while batch:
+                output.write_rows(batch)
+                rows += len(batch)
+                started = time.monotonic()
+                batch = cursor.fetchmany(self.fetch_size)
+                timings['db_seconds'] += time.monotonic() - started
+        
+        return rows
+    
+    def _output_extension(self):
+        extension = OUTPUT_FORMATS[self.output_format].extension
+        return extension + COMPRESSION_EXTENSIONS[self.output_options['compression']]
+    
+    def _output_path(self, table_name, day):
+        name = f"{table_name}_{day.strftime('%Y-%m-%d')}"
+        if self.incremental and table_name in EXPORT_TABLES:
+            # Дельта именуется по нижней границе окна: повтор после сбоя перезаписывает свой же файл,
+            # а следующий запуск за тот же день пишет новый и не затирает предыдущую дельту
+            low = None if self.force_full else self.watermarks.get(table_name)
+            name += f"_since-{low.strftime('%Y%m%dT%H%M%S%f')}" if low else "_full"
+        return os.path.join(self.export_dir, f"{name}.{self._output_extension()}")
+    
+    def _write_manifest(self, day, run_id=None):
+        manifest = {
+            'export_date': day.isoformat(),
+            'generated_at': datetime.now().isoformat(),
+            'format': self.output_format,
+            'compression': self.output_options['compression'],
+            'tables': self.manifest,
+        }
+        
+        # Инкрементальных запусков за день может быть несколько, у каждого свой манифест
+        suffix = f"_{run_id}" if run_id else ""
+        manifest_path = os.path.join(self.export_dir, f"manifest_{day.strftime('%Y-%m-%d')}{suffix}.json")
+        tmp_path = f"{manifest_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, manifest_path)
+        
+        logger.info(f"Манифест выгрузки записан: {manifest_path}")
+    
+    def _publish_run_metrics(self, day, started_at, duration, success, total_records, error=None):
+        finished_at = datetime.now()
+        summary = {
+            'export_date': day.isoformat(),
+            'started_at': started_at.isoformat(),
+            'finished_at': finished_at.isoformat(),
+            'finished_at_epoch': int(finished_at.timestamp()),
+            'duration_seconds': duration,
+            'deadline_seconds': self.deadline_seconds,
+            'success': success,
+            'error': error,
+            'total_records': total_records,
+            'peak_rss_mb': TablePeakMemory.process_peak_mb(),
+            'tables': self.table_stats,
+        }
+        
+        summary_path = os.path.join(self.export_dir, f"run_summary_{day.strftime('%Y-%m-%d')}.json")
+        tmp_path = f"{summary_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, summary_path)
+        logger.info(f"Сводка запуска записана: {summary_path}")
+        
+        if self.deadline_seconds and duration > 0.8 * self.deadline_seconds:
+            logger.warning(
+                f"Экспорт занял {duration:.0f} с из бюджета {self.deadline_seconds} с"
+            )
+        
+        metrics = render_prometheus(summary)
+        
+        if self.metrics_textfile:
+            # node_exporter читает файл целиком, поэтому подменяем его атомарно
+            tmp_path = f"{self.metrics_textfile}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(metrics)
+            os.replace(tmp_path, self.metrics_textfile)
+            logger.info(f"Метрики записаны: {self.metrics_textfile}")
+        
+        if self.pushgateway_url:
+            request = urllib.request.Request(
+                f"{self.pushgateway_url.rstrip('/')}/metrics/job/data_export",
+                data=metrics.encode('utf-8'),
+                method='PUT',
+                headers={'Content-Type': 'text/plain; version=0.0.4'}
+            )
+            try:
+                with urllib.request.urlopen(request, timeout=10) as response:
+                    logger.info(f"Метрики отправлены в Pushgateway: HTTP {response.status}")
+            except OSError as e:
+                # Недоступность мониторинга не должна ронять сам экспорт
+                logger.warning(f"Не удалось отправить метрики в Pushgateway: {e}")
+    
+    def _copy_query_to_csv(self, connection, table_name, query, params, filepath, timings):
+        # Заголовок пишет сам COPY, ротация для этого движка не применяется
+        output = CsvOutput(f"{filepath}.tmp", TABLE_SCHEMAS[table_name], self.output_options, timings, header=False)
+        try:
+            with connection.cursor() as cursor:
+                # COPY не поддерживает параметры запроса, поэтому подставляем их через mogrify
+                select = cursor.mogrify(query, params).decode('utf-8').strip()
+                copy_sql = f"COPY ({select}) TO STDOUT WITH (FORMAT CSV, HEADER, ENCODING 'UTF8')"
+                cursor.copy_expert(copy_sql, output.binary)
+                rows = cursor.rowcount
+        except Exception:
+            output.close()
+            os.remove(f"{filepath}.tmp")
+            raise
+        
+        output.close()
+        os.replace(f"{filepath}.tmp", filepath)
+        return rows
+    
+    def _journal_config(self):
+        # Части прерванной попытки пригодны, только если файлы пишутся так же
+        return {
+            'mode': self.export_mode,
+            'format': self.output_format,
+            'compression': self.output_options['compression'],
+            'rotate_rows': self.output_options['rotate_rows'],
+            'rotate_bytes': self.output_options['rotate_bytes'],
+        }
+    
+    def _open_journal(self, day):
+        self.journal_path = os.path.join(self.export_dir, f"export_journal_{day.strftime('%Y-%m-%d')}.json")
+        self.journal = {'config': self._journal_config(), 'tables': {}}
+        
+        if not self.resume or not os.path.exists(self.journal_path):
+            return
+        
+        with open(self.journal_path, encoding='utf-8') as f:
+            journal = json.load(f)
+        
+        if journal.get('config') != self.journal['config']:
+            logger.warning("Настройки выгрузки изменились с прошлой попытки, журнал запуска не используется")
+            return
+        
+        self.journal = journal
+        logger.info(f"Продолжаем прерванный запуск по журналу: {self.journal_path}")
+    
+    def _save_journal(self):
+        tmp_path = f"{self.journal_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.journal, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.journal_path)
+    
+    def _journal_table(self, table_name, entry):
+        if self.journal_path is None:
+            return
+        
+        with self.state_lock:
+            self.journal['tables'][table_name] = entry
+            self._save_journal()
+    
+    def _journal_entry(self, table_name, status):
+        entry = self.journal['tables'].get(table_name)
+        if entry is None or entry['status'] != status:
+            return None
+        
+        parts = entry['manifest']['parts'] if status == 'done' else entry['parts']
+        for part in parts:
+            # Файл, изменившийся после фиксации, нельзя считать выгруженным
+            path = os.path.join(self.export_dir, part['file'])
+            if not os.path.exists(path) or os.path.getsize(path) != part['bytes']:
+                logger.warning(f"Файл {part['file']} не совпадает с журналом, таблица {table_name} выгружается заново")
+                return None
+        
+        return entry
+    
+    def _checkpoint_table(self, table_name, parts, key):
+        entry = {
+            'status': 'partial',
+            'rows': sum(part['rows'] for part in parts),
+            'parts': list(parts),
+            'key': [journal_value(value) for value in key],
+        }
+        with self.state_lock:
+            high = self.pending_watermarks.get(table_name)
+        if high is not None:
+            # Повтор должен дочитать тот же диапазон, а не новый MAX
+            entry['watermark'] = high.isoformat()
+        
+        self._journal_table(table_name, entry)
+        logger.info(f"Контрольная точка {table_name}: {entry['rows']} строк в {len(parts)} частях")
+    
+    def _resume_point(self, table_name):
+        entry = self._journal_entry(table_name, 'partial')
+        if entry is None:
+            return [], None
+        
+        logger.info(f"Продолжаем выгрузку {table_name} после {entry['rows']} строк, ключ {entry['key']}")
+        return entry['parts'], entry['key']
+    
+    def _day_range(self, day):
+        # Полуинтервал [day, day + 1) позволяет использовать индекс по created_at в отличие от DATE(created_at)
+        start = datetime(day.year, day.month, day.day)
+        return [start, start + timedelta(days=1)]
+    
+    def _load_watermarks(self):
+        if not os.path.exists(self.state_file):
+            return {}
+        
+        with open(self.state_file, encoding='utf-8') as f:
+            state = json.load(f)
+        
+        return {
+            table_name: datetime.fromisoformat(table_state['watermark'])
+            for table_name, table_state in state.items()
+        }
+    
+    def _save_watermarks(self):
+        state = {
+            table_name: {
+                'watermark': watermark.isoformat(),
+                'updated_at': datetime.now().isoformat()
+            }
+            for table_name, watermark in self.watermarks.items()
+        }
+        
+        # Запись через временный файл, чтобы сбой посреди записи не испортил состояние
+        tmp_path = f"{self.state_file}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, self.state_file)
+    
+    def _incremental_filter(self, connection, table_name, column, alias=None):
+        qualified = f"{alias}.{column}" if alias else column
+        
+        # Верхняя граница фиксируется до выгрузки, строки новее нее попадут в следующий запуск
+        resumed = self._journal_entry(table_name, 'partial')
+        if resumed and resumed.get('watermark'):
+            high = datetime.fromisoformat(resumed['watermark'])
+        else:
+            with connection.cursor() as cursor:
+                cursor.execute(f"SELECT MAX({column}) FROM {table_name}")
+                high = cursor.fetchone()[0]
+        
+        with self.state_lock:
+            low = None if self.force_full else self.watermarks.get(table_name)
+            self.pending_watermarks[table_name] = high
+        
+        if high is None:
+            return "WHERE FALSE", None
+        if low is None:
+            logger.info(f"Полная выгрузка {table_name}: {column} <= {high}")
+            return f"WHERE {qualified} <= %s", [high]
+        
+        logger.info(f"Инкрементальная выгрузка {table_name}: {column} в ({low}, {high}]")
+        return f"WHERE {qualified} > %s AND {qualified} <= %s", [low, high]
+    
+    def _commit_watermarks(self):
+        # Водяные знаки сдвигаются только после манифеста всего запуска: при сбое посреди запуска
+        # повтор выгрузит те же окна, в том числе для уже завершенных таблиц
+        if not self.incremental:
+            return
+        
+        with self.state_lock:
+            self.watermarks.update(
+                (table_name, high) for table_name, high in self.pending_watermarks.items() if high is not None
+            )
+            self.pending_watermarks = {}
+            self._save_watermarks()
+    
+    def export_shipments(self, connection, day=None):
+        # Без явной даты выгружается текущий день, backfill передает дату партиции
+        day = day or date.today()
+        filepath = self._output_path('shipments', day)
         
         logger.info(f"Экспорт данных перевозок в файл: {filepath}")
         
         try:
-            query = """
+            if self.incremental:
+                where_clause, params = self._incremental_filter(connection, 'shipments', 'updated_at')
+            else:
+                where_clause, params = "WHERE created_at >= %s AND created_at < %s", self._day_range(day)
+            
+            query = f"""
                 SELECT 
                     id, 
                     tracking_number, 
@@ -62,29 +1036,32 @@ class DataExporter:
                     vehicle_id, 
                     client_id
                 FROM shipments 
-                WHERE DATE(created_at) = %s
-                ORDER BY created_at
+                {where_clause}
+                ORDER BY created_at, id
             """
             
-            df = pd.read_sql_query(query, connection, params=[today])
-            df.to_csv(filepath, index=False, encoding='utf-8')
+            rows = self._export_query(connection, 'shipments', query, params, filepath)
             
-            logger.info(f"Экспортировано {len(df)} записей перевозок")
-            return len(df)
+            logger.info(f"Экспортировано {rows} записей перевозок")
+            return rows
             
         except Exception as e:
             logger.error(f"Ошибка при экспорте перевозок: {e}")
             raise
     
-    def export_shipment_events(self, connection):
-        today = date.today()
-        filename = f"shipment_events_{today.strftime('%Y-%m-%d')}.csv"
-        filepath = os.path.join(self.export_dir, filename)
+    def export_shipment_events(self, connection, day=None):
+        day = day or date.today()
+        filepath = self._output_path('shipment_events', day)
         
         logger.info(f"Экспорт событий перевозок в файл: {filepath}")
         
         try:
-            query = """
+            if self.incremental:
+                where_clause, params = self._incremental_filter(connection, 'shipment_events', 'created_at', 'se')
+            else:
+                where_clause, params = "WHERE se.created_at >= %s AND se.created_at < %s", self._day_range(day)
+            
+            query = f"""
                 SELECT 
                     se.id,
                     se.shipment_id,
@@ -95,15 +1072,14 @@ class DataExporter:
                     s.tracking_number
                 FROM shipment_events se
                 JOIN shipments s ON se.shipment_id = s.id
-                WHERE DATE(se.created_at) = %s
-                ORDER BY se.created_at
+                {where_clause}
+                ORDER BY se.created_at, se.id
             """
             
-            df = pd.read_sql_query(query, connection, params=[today])
-            df.to_csv(filepath, index=False, encoding='utf-8')
+            rows = self._export_query(connection, 'shipment_events', query, params, filepath)
             
-            logger.info(f"Экспортировано {len(df)} событий перевозок")
-            return len(df)
+            logger.info(f"Экспортировано {rows} событий перевозок")
+            return rows
             
         except Exception as e:
             logger.error(f"Ошибка при экспорте событий перевозок: {e}")
@@ -111,13 +1087,16 @@ class DataExporter:
     
     def export_drivers(self, connection):
         today = date.today()
-        filename = f"drivers_{today.strftime('%Y-%m-%d')}.csv"
-        filepath = os.path.join(self.export_dir, filename)
+        filepath = self._output_path('drivers', today)
         
         logger.info(f"Экспорт данных водителей в файл: {filepath}")
         
         try:
-            query = """
+            where_clause, params = "", None
+            if self.incremental:
+                where_clause, params = self._incremental_filter(connection, 'drivers', 'created_at')
+            
+            query = f"""
                 SELECT 
                     id,
                     first_name,
@@ -127,14 +1106,14 @@ class DataExporter:
                     email,
                     created_at
                 FROM drivers
-                ORDER BY created_at
+                {where_clause}
+                ORDER BY created_at, id
             """
             
-            df = pd.read_sql_query(query, connection)
-            df.to_csv(filepath, index=False, encoding='utf-8')
+            rows = self._export_query(connection, 'drivers', query, params, filepath)
             
-            logger.info(f"Экспортировано {len(df)} записей водителей")
-            return len(df)
+            logger.info(f"Экспортировано {rows} записей водителей")
+            return rows
             
         except Exception as e:
             logger.error(f"Ошибка при экспорте водителей: {e}")
@@ -142,13 +1121,16 @@ class DataExporter:
     
     def export_vehicles(self, connection):
         today = date.today()
-        filename = f"vehicles_{today.strftime('%Y-%m-%d')}.csv"
-        filepath = os.path.join(self.export_dir, filename)
+        filepath = self._output_path('vehicles', today)
         
         logger.info(f"Экспорт данных транспорта в файл: {filepath}")
         
         try:
-            query = """
+            where_clause, params = "", None
+            if self.incremental:
+                where_clause, params = self._incremental_filter(connection, 'vehicles', 'created_at')
+            
+            query = f"""
                 SELECT 
                     id,
                     license_plate,
@@ -156,14 +1138,14 @@ class DataExporter:
                     capacity_kg,
                     created_at
                 FROM vehicles
-                ORDER BY created_at
+                {where_clause}
+                ORDER BY created_at, id
             """
             
-            df = pd.read_sql_query(query, connection)
-            df.to_csv(filepath, index=False, encoding='utf-8')
+            rows = self._export_query(connection, 'vehicles', query, params, filepath)
             
-            logger.info(f"Экспортировано {len(df)} записей транспорта")
-            return len(df)
+            logger.info(f"Экспортировано {rows} записей транспорта")
+            return rows
             
         except Exception as e:
             logger.error(f"Ошибка при экспорте транспорта: {e}")
@@ -171,13 +1153,16 @@ class DataExporter:
     
     def export_clients(self, connection):
         today = date.today()
-        filename = f"clients_{today.strftime('%Y-%m-%d')}.csv"
-        filepath = os.path.join(self.export_dir, filename)
+        filepath = self._output_path('clients', today)
         
         logger.info(f"Экспорт данных клиентов в файл: {filepath}")
         
         try:
-            query = """
+            where_clause, params = "", None
+            if self.incremental:
+                where_clause, params = self._incremental_filter(connection, 'clients', 'created_at')
+            
+            query = f"""
                 SELECT 
                     id,
                     company_name,
@@ -187,49 +1172,429 @@ class DataExporter:
                     address,
                     created_at
                 FROM clients
-                ORDER BY created_at
+                {where_clause}
+                ORDER BY created_at, id
             """
             
-            df = pd.read_sql_query(query, connection)
-            df.to_csv(filepath, index=False, encoding='utf-8')
+            rows = self._export_query(connection, 'clients', query, params, filepath)
             
-            logger.info(f"Экспортировано {len(df)} записей клиентов")
-            return len(df)
+            logger.info(f"Экспортировано {rows} записей клиентов")
+            return rows
             
         except Exception as e:
             logger.error(f"Ошибка при экспорте клиентов: {e}")
             raise
     
+    def export_wide_shipments(self, connection, day=None):
+        day = day or date.today()
+        filepath = self._output_path('shipments_wide', day)
+        
+        logger.info(f"Экспорт денормализованных перевозок в файл: {filepath}")
+        
+        try:
+            where_clause, params = "WHERE created_at >= %s AND created_at < %s", self._day_range(day)
+            committed_parts, key = self._resume_point('shipments_wide')
+            if key is not None:
+                # Оба потока отсортированы по id перевозки, поэтому дочитываем их с одной границы
+                where_clause += " AND id > %s"
+                params = params + key
+            with TablePeakMemory('shipments_wide') as memory:
+                started = time.monotonic()
+                
+                # Справочники небольшие, поэтому держим их в памяти как словари id -> атрибуты
+                lookups = {}
+                with connection.cursor() as cursor:
+                    for lookup_name, lookup_query in WIDE_LOOKUP_QUERIES.items():
+                        cursor.execute(lookup_query)
+                        lookups[lookup_name] = {row[0]: tuple(row[1:]) for row in cursor}
+                timings = new_timings()
+                timings['db_seconds'] = time.monotonic() - started
+                
+                shipments_query = f"""
+                    SELECT 
+                        id, 
+                        tracking_number, 
+                        origin, 
+                        destination, 
+                        created_at, 
+                        updated_at, 
+                        status, 
+                        driver_id, 
+                        vehicle_id, 
+                        client_id
+                    FROM shipments 
+                    {where_clause}
+                    ORDER BY id
+                """
+                events_query = f"""
+                    SELECT shipment_id, COUNT(*)
+                    FROM shipment_events
+                    WHERE shipment_id IN (SELECT id FROM shipments {where_clause})
+                    GROUP BY shipment_id
+                    ORDER BY shipment_id
+                """
+                
+                rows = 0
+                output = self._open_output('shipments_wide', filepath, timings, committed_parts)
+                try:
+                    with connection.cursor(name="export_wide_shipments") as shipments_cursor, \
+                            connection.cursor(name="export_wide_event_counts") as events_cursor:
+                        shipments_cursor.itersize = self.fetch_size
+                        events_cursor.itersize = self.fetch_size
+                        query_started = time.monotonic()
+                        shipments_cursor.execute(shipments_query, params)
+                        events_cursor.execute(events_query, params)
+                        timings['db_seconds'] += time.monotonic() - query_started
+                
+                        shipments = iter_cursor(shipments_cursor, self.fetch_size, timings)
+                        event_counts = iter_cursor(events_cursor, self.fetch_size, timings)
+                
+                        batch = []
+                        for shipment, event_count in merge_event_counts(shipments, event_counts):
+                            batch.append(build_wide_row(shipment, event_count, lookups))
+                            if len(batch) >= self.fetch_size:
+                                output.write_rows(batch)
+                                rows += len(batch)
+                                batch = []
+                        output.write_rows(batch)
+                        rows += len(batch)
+                except Exception:
+                    output.abort()
+                    raise
+                parts = output.close()
+                rows += sum(part['rows'] for part in committed_parts)
+                
+                self._record_table('shipments_wide', 'stream', rows, parts, started, timings, memory)
+            
+            logger.info(f"Экспортировано {rows} денормализованных записей перевозок")
+            return rows
+            
+        except Exception as e:
+            logger.error(f"Ошибка при экспорте денормализованных перевозок: {e}")
+            raise
+    
+    def _table_exporters(self):
+        exporters = [
+            ('shipments', self.export_shipments),
+            ('shipment_events', self.export_shipment_events),
+            ('drivers', self.export_drivers),
+            ('vehicles', self.export_vehicles),
+            ('clients', self.export_clients),
+        ]
+        if self.wide_shipments:
+            exporters.append(('shipments_wide', self.export_wide_shipments))
+        return exporters
+    
+    def _pending_exporters(self):
+        exporters = []
+        for table_name, export in self._table_exporters():
+            entry = self._journal_entry(table_name, 'done')
+            if entry is None:
+                exporters.append((table_name, export))
+                continue
+            
+            # Таблица выгружена предыдущей попыткой: берем ее файлы и статистику из журнала
+            self.manifest[table_name] = entry['manifest']
+            self.table_stats[table_name] = entry['stats']
+            self.resumed_records += entry['manifest']['rows']
+            if entry.get('watermark'):
+                self.pending_watermarks[table_name] = datetime.fromisoformat(entry['watermark'])
+            logger.info(f"Таблица {table_name} уже выгружена предыдущей попыткой, пропускаем")
+        
+        return exporters
+    
+    def _export_sequential(self, connection):
+        timings = {}
+        total_records = 0
+        
+        for table_name, export in self._pending_exporters():
+            started = time.monotonic()
+            total_records += export(connection)
+            timings[table_name] = time.monotonic() - started
+        
+        return total_records, timings
+    
+    def _export_parallel(self, connection):
+        # Координирующее соединение держит транзакцию открытой, пока воркеры читают из ее снимка
+        connection.set_session(
+            isolation_level=extensions.ISOLATION_LEVEL_REPEATABLE_READ,
+            readonly=True
+        )
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_export_snapshot()")
+            snapshot_id = cursor.fetchone()[0]
+        
+        logger.info(f"Параллельный экспорт: {self.parallel_workers} воркеров, снимок {snapshot_id}")
+        
+        connection_pool = pool.ThreadedConnectionPool(1, self.parallel_workers, **self.db_config)
+        timings = {}
+        total_records = 0
+        
+        try:
+            with ThreadPoolExecutor(max_workers=self.parallel_workers) as executor:
+                futures = {
+                    executor.submit(self._export_in_snapshot, connection_pool, snapshot_id, export): table_name
+                    for table_name, export in self._pending_exporters()
+                }
+                try:
+                    for future in as_completed(futures):
+                        rows, elapsed = future.result()
+                        total_records += rows
+                        timings[futures[future]] = elapsed
+                except Exception:
+                    for future in futures:
+                        future.cancel()
+                    raise
+        finally:
+            connection_pool.closeall()
+            connection.rollback()
+        
+        return total_records, timings
+    
+    def _export_in_snapshot(self, connection_pool, snapshot_id, export):
+        connection = connection_pool.getconn()
+        try:
+            connection.set_session(
+                isolation_level=extensions.ISOLATION_LEVEL_REPEATABLE_READ,
+                readonly=True
+            )
+            with connection.cursor() as cursor:
+                # Должен быть первым запросом транзакции, иначе PostgreSQL отклонит снимок
+                cursor.execute("SET TRANSACTION SNAPSHOT %s", (snapshot_id,))
+            
+            started = time.monotonic()
+            rows = export(connection)
+            return rows, time.monotonic() - started
+        finally:
+            self._release_connection(connection_pool, connection)
+    
+    def _release_connection(self, connection_pool, connection):
+        # После обрыва соединения rollback сам падает с InterfaceError и скрыл бы исходную ошибку,
+        # а такое соединение нельзя возвращать в пул: его место занимает новое
+        close = bool(connection.closed)
+        if not close:
+            try:
+                connection.rollback()
+            except psycopg2.Error as e:
+                logger.warning(f"Не удалось откатить транзакцию, соединение закрывается: {e}")
+                close = True
+        connection_pool.putconn(connection, close=close)
+    
     def run_export(self):
         logger.info(f"Начинаем экспорт данных за {date.today()}")
         
+        started_at = datetime.now()
+        started = time.monotonic()
         connection = None
         try:
+            self._open_journal(date.today())
             connection = self.connect_to_database()
             
-            total_records = 0
-            total_records += self.export_shipments(connection)
-            total_records += self.export_shipment_events(connection)
-            total_records += self.export_drivers(connection)
-            total_records += self.export_vehicles(connection)
-            total_records += self.export_clients(connection)
+            if self.parallel_workers > 1:
+                total_records, timings = self._export_parallel(connection)
+            else:
+                total_records, timings = self._export_sequential(connection)
+            total_records += self.resumed_records
+            wall_time = time.monotonic() - started
             
+            breakdown = ", ".join(
+                f"{table_name}={elapsed:.2f} с"
+                for table_name, elapsed in sorted(timings.items(), key=lambda item: -item[1])
+            )
+            logger.info(f"Время по таблицам: {breakdown}")
+            logger.info(f"Общее время: {wall_time:.2f} с, сумма по таблицам: {sum(timings.values()):.2f} с")
+            self._write_manifest(date.today(), started_at.strftime('%H%M%S%f') if self.incremental else None)
+            self._commit_watermarks()
+            self._publish_run_metrics(date.today(), started_at, wall_time, True, total_records)
+            # Итог запуска уже в манифесте, следующий запуск за ту же дату начнется заново
+            if os.path.exists(self.journal_path):
+                os.remove(self.journal_path)
             logger.info(f"Экспорт завершен успешно. Всего записей: {total_records}")
             
         except Exception as e:
             logger.error(f"Ошибка при экспорте данных: {e}")
+            if self.journal_path and os.path.exists(self.journal_path):
+                logger.info(f"Повторный запуск продолжит выгрузку по журналу {self.journal_path}")
+            try:
+                self._publish_run_metrics(
+                    date.today(), started_at, time.monotonic() - started, False, 0, error=str(e)
+                )
+            except Exception as metrics_error:
+                logger.error(f"Ошибка при записи метрик: {metrics_error}")
             sys.exit(1)
         finally:
             if connection:
                 connection.close()
                 logger.info("Соединение с базой данных закрыто")
+    
+    def _partition_exporters(self, day):
+        # Справочники не делятся по дням, в backfill выгружаются только таблицы с датой создания
+        exporters = [
+            ('shipments', self.export_shipments),
+            ('shipment_events', self.export_shipment_events),
+        ]
+        if self.wide_shipments:
+            exporters.append(('shipments_wide', self.export_wide_shipments))
+        return [(table_name, lambda connection, export=export: export(connection, day)) for table_name, export in exporters]
+    
+    def _partition_is_valid(self, day):
+        manifest_path = os.path.join(self.export_dir, f"manifest_{day.strftime('%Y-%m-%d')}.json")
+        if not os.path.exists(manifest_path):
+            return False
+        
+        with open(manifest_path, encoding='utf-8') as f:
+            manifest = json.load(f)
+        
+        if manifest['format'] != self.output_format or manifest['compression'] != self.output_options['compression']:
+            return False
+        
+        for table_name, _ in self._partition_exporters(day):
+            if table_name not in manifest['tables']:
+                return False
+            for part in manifest['tables'][table_name]['parts']:
+                path = os.path.join(self.export_dir, part['file'])
+                if not os.path.exists(path) or describe_part(path, part['rows']) != part:
+                    logger.warning(f"Файл {part['file']} не совпадает с манифестом за {day}")
+                    return False
+        
+        return True
+    
+    def _export_partition(self, connection_pool, day):
+        # У каждой партиции свой экспортер, чтобы манифест и статистика дней не смешивались
+        partition = DataExporter(explain=self.explain, resume=False)
+        connection = connection_pool.getconn()
+        started = time.monotonic()
+        try:
+            for _, export in partition._partition_exporters(day):
+                export(connection)
+            partition._write_manifest(day)
+        finally:
+            # Оборванное соединение закрывается и освобождает место в пуле для остальных дней
+            self._release_connection(connection_pool, connection)
+        
+        elapsed = time.monotonic() - started
+        rows = sum(stats['rows'] for stats in partition.table_stats.values())
+        size_bytes = sum(stats['bytes'] for stats in partition.table_stats.values())
+        return {
+            'rows': rows,
+            'bytes': size_bytes,
+            'seconds': elapsed,
+            'rows_per_sec': rows / elapsed if elapsed > 0 else 0,
+            'mb_per_sec': size_bytes / (1024 * 1024) / elapsed if elapsed > 0 else 0,
+        }
+    
+    def run_backfill(self, start_day, end_day, workers=None):
+        workers = workers or self.backfill_workers
+        if self.incremental:
+            raise ValueError("Backfill выгружает дни целиком и не совместим с EXPORT_MODE=incremental")
+        if end_day < start_day:
+            raise ValueError(f"Конец периода {end_day} раньше начала {start_day}")
+        
+        days = [start_day + timedelta(days=offset) for offset in range((end_day - start_day).days + 1)]
+        pending = []
+        for day in days:
+            if self._partition_is_valid(day):
+                logger.info(f"Партиция {day} уже выгружена, пропускаем")
+            else:
+                pending.append(day)
+        
+        logger.info(
+            f"Backfill {start_day} - {end_day}: {len(pending)} из {len(days)} партиций, {workers} воркеров"
+        )
+        if not pending:
+            return
+        
+        # Пул ограничивает число соединений с БД: не больше одного на воркер
+        connection_pool = pool.ThreadedConnectionPool(1, workers, **self.db_config)
+        results = {}
+        failed = []
+        started = time.monotonic()
+        
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {
+                    executor.submit(self._export_partition, connection_pool, day): day
+                    for day in pending
+                }
+                for future in as_completed(futures):
+                    day = futures[future]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        logger.error(f"Ошибка при выгрузке партиции {day}: {e}")
+                        failed.append(day)
+                        continue
+                    
+                    results[day] = result
+                    logger.info(
+                        f"Партиция {day}: {result['rows']} строк за {result['seconds']:.2f} с, "
+                        f"{result['rows_per_sec']:.0f} строк/с, {result['mb_per_sec']:.2f} МБ/с"
+                    )
+        finally:
+            connection_pool.closeall()
+        
+        wall_time = time.monotonic() - started
+        total_rows = sum(result['rows'] for result in results.values())
+        logger.info("Пропускная способность по партициям:")
+        for day in sorted(results):
+            result = results[day]
+            logger.info(
+                f"  {day}: {result['rows']:>10} строк {result['seconds']:>8.2f} с "
+                f"{result['rows_per_sec']:>10.0f} строк/с {result['mb_per_sec']:>8.2f} МБ/с"
+            )
+        logger.info(
+            f"Backfill: {len(results)} партиций, {total_rows} строк за {wall_time:.2f} с "
+            f"({total_rows / wall_time if wall_time > 0 else 0:.0f} строк/с)"
+        )
+        
+        if failed:
+            raise RuntimeError(f"Не выгружены партиции: {', '.join(str(day) for day in sorted(failed))}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Экспорт данных freight_analytics в CSV')
+    parser.add_argument(
+        '--full',
+        action='store_true',
+        help='Принудительная полная выгрузка в инкрементальном режиме с пересчетом водяных знаков'
+    )
+    parser.add_argument(
+        '--explain',
+        action='store_true',
+        help='Логировать EXPLAIN (ANALYZE, BUFFERS) каждого запроса выгрузки (запросы выполняются повторно)'
+    )
+    parser.add_argument(
+        '--restart',
+        action='store_true',
+        help='Не продолжать прерванный запуск по журналу, выгрузить все таблицы заново'
+    )
+    parser.add_argument(
+        '--backfill-from',
+        type=date.fromisoformat,
+        help='Первый день backfill (YYYY-MM-DD): перевозки и события выгружаются по дням за период'
+    )
+    parser.add_argument(
+        '--backfill-to',
+        type=date.fromisoformat,
+        help='Последний день backfill включительно (по умолчанию вчера)'
+    )
+    parser.add_argument(
+        '--backfill-workers',
+        type=int,
+        help='Число одновременно выгружаемых дней и соединений с БД (по умолчанию EXPORT_BACKFILL_WORKERS)'
+    )
+    return parser.parse_args()
 
 def main():
+    args = parse_args()
     logger.info("Запуск приложения экспорта данных")
     
     try:
-        exporter = DataExporter()
-        exporter.run_export()
+        exporter = DataExporter(force_full=args.full, explain=args.explain, resume=not args.restart)
+        if args.backfill_from:
+            backfill_to = args.backfill_to or date.today() - timedelta(days=1)
+            exporter.run_backfill(args.backfill_from, backfill_to, args.backfill_workers)
+        else:
+            exporter.run_export()
         logger.info("Приложение завершило работу успешно")
         sys.exit(0)
     except Exception as e:
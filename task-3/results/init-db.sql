@@ -65,6 +65,12 @@ CREATE INDEX IF NOT EXISTS idx_shipments_status ON shipments(status);
 CREATE INDEX IF NOT EXISTS idx_shipment_events_shipment_id ON shipment_events(shipment_id);
 CREATE INDEX IF NOT EXISTS idx_shipment_events_created_at ON shipment_events(created_at);
 
+-- Индексы для выгрузки по диапазонам дат и инкрементального режима экспорта
+CREATE INDEX IF NOT EXISTS idx_shipments_updated_at ON shipments(updated_at);
+CREATE INDEX IF NOT EXISTS idx_drivers_created_at ON drivers(created_at);
+CREATE INDEX IF NOT EXISTS idx_vehicles_created_at ON vehicles(created_at);
+CREATE INDEX IF NOT EXISTS idx_clients_created_at ON clients(created_at);
+
 -- Вставка тестовых данных
 INSERT INTO drivers (first_name, last_name, license_number, phone, email) VALUES
 ('Иван', 'Петров', 'DL123456', '+7-900-123-4567', 'ivan.petrov@example.com'),
@@ -1,9 +1,22 @@
+import os
+import math
+import random
+import argparse
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import time
 import logging
-from opentelemetry import trace
+import functools
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from opentelemetry import metrics, trace
+from opentelemetry.sdk.metrics import MeterProvider
+from opentelemetry.sdk.metrics.export import PeriodicExportingMetricReader
+from opentelemetry.sdk.metrics.view import ExplicitBucketHistogramAggregation, View
 from opentelemetry.sdk.trace import TracerProvider
 from opentelemetry.sdk.trace.export import BatchSpanProcessor
+from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
 from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
 from opentelemetry.sdk.resources import Resource
 from opentelemetry.instrumentation.requests import RequestsInstrumentor
@@ -16,29 +29,200 @@ logging.basicConfig(
 
 logger = logging.getLogger("BatchClient")
 
+# Upper bounds of latency histogram buckets, ms
+LATENCY_BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000]
+
+# Status polling of submitted jobs: delay doubles from POLL_INITIAL_DELAY up to POLL_MAX_DELAY, seconds
+POLL_INITIAL_DELAY = 0.5
+POLL_MAX_DELAY = 10
+JOB_WAIT_TIMEOUT = 600
+TERMINAL_JOB_STATUSES = {"COMPLETED", "FAILED", "STOPPED", "ABANDONED"}
+
+# (connect, read) timeouts per endpoint, seconds
+ENDPOINT_TIMEOUTS = {
+    "run-batch": (3.05, 30),
+    "status": (3.05, 10),
+    "jobs": (3.05, 10),
+    "job-status": (3.05, 5),
+}
+DEFAULT_POOL_SIZE = 10
+STATUS_RETRIES = 3
+STATUS_RETRY_BACKOFF = 0.5
+RETRY_STATUS_CODES = [502, 503, 504]
+
+# Tracing: false turns the client tracer into a no-op and leaves requests uninstrumented
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+OTLP_TRACES_ENDPOINT = os.getenv("OTLP_TRACES_ENDPOINT", "http://jaeger:4318/v1/traces")
+# Share of root traces to keep; with parent-based sampling child spans follow the decision of their parent
+TRACE_SAMPLE_RATIO = float(os.getenv("TRACE_SAMPLE_RATIO", "1.0"))
+TRACE_PARENT_BASED = os.getenv("TRACE_PARENT_BASED", "true").lower() == "true"
+# Span export queue: spans that do not fit into a full queue are dropped
+SPAN_QUEUE_SIZE = int(os.getenv("SPAN_QUEUE_SIZE", "2048"))
+SPAN_BATCH_SIZE = int(os.getenv("SPAN_BATCH_SIZE", "512"))
+SPAN_EXPORT_INTERVAL_MS = int(os.getenv("SPAN_EXPORT_INTERVAL_MS", "5000"))
+
+# Client metrics: otlp - push to OTLP_METRICS_ENDPOINT, prometheus - scrape endpoint on METRICS_PORT
+# (only suits long load runs: a one-shot client exits before it is scraped), none - off
+METRICS_EXPORTER = os.getenv("METRICS_EXPORTER", "otlp")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9464"))
+OTLP_METRICS_ENDPOINT = os.getenv("OTLP_METRICS_ENDPOINT", "http://prometheus:9090/api/v1/otlp/v1/metrics")
+METRICS_EXPORT_INTERVAL_MS = int(os.getenv("METRICS_EXPORT_INTERVAL_MS", "5000"))
+REQUEST_DURATION_METRIC = "batch_client.request.duration"
+
 resource = Resource(attributes={
     "service.name": "batch-client"
 })
 
-provider = TracerProvider(resource=resource)
-otlp_exporter = OTLPSpanExporter(endpoint="http://jaeger:4318/v1/traces")
-span_processor = BatchSpanProcessor(otlp_exporter)
-provider.add_span_processor(span_processor)
+def create_sampler(sample_ratio=TRACE_SAMPLE_RATIO, parent_based=TRACE_PARENT_BASED):
+    sampler = TraceIdRatioBased(sample_ratio)
+    return ParentBased(sampler) if parent_based else sampler
+
+def create_tracer_provider(exporter, sampler=None, queue_size=SPAN_QUEUE_SIZE,
+                           batch_size=SPAN_BATCH_SIZE, export_interval_ms=SPAN_EXPORT_INTERVAL_MS):
+    provider = TracerProvider(resource=resource, sampler=sampler or create_sampler())
+    provider.add_span_processor(BatchSpanProcessor(
+        exporter,
+        max_queue_size=queue_size,
+        # The SDK rejects a batch larger than the queue
+        max_export_batch_size=min(batch_size, queue_size),
+        schedule_delay_millis=export_interval_ms
+    ))
+    return provider
+
+if TRACING_ENABLED:
+    provider = create_tracer_provider(OTLPSpanExporter(endpoint=OTLP_TRACES_ENDPOINT))
+    trace.set_tracer_provider(provider)
+    RequestsInstrumentor().instrument()
+    logger.info(
+        f"Tracing to {OTLP_TRACES_ENDPOINT}: sample ratio {TRACE_SAMPLE_RATIO}, "
+        f"parent-based {TRACE_PARENT_BASED}, queue {SPAN_QUEUE_SIZE}, batch {min(SPAN_BATCH_SIZE, SPAN_QUEUE_SIZE)}"
+    )
+else:
+    trace.set_tracer_provider(trace.NoOpTracerProvider())
 
-trace.set_tracer_provider(provider)
 tracer = trace.get_tracer(__name__)
 
-RequestsInstrumentor().instrument()
+def metric_readers(exporter=METRICS_EXPORTER):
+    if exporter == "prometheus":
+        from opentelemetry.exporter.prometheus import PrometheusMetricReader
+        from prometheus_client import start_http_server
+        
+        start_http_server(METRICS_PORT)
+        logger.info(f"Serving client metrics for Prometheus on port {METRICS_PORT}")
+        return [PrometheusMetricReader()]
+    if exporter == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.metric_exporter import OTLPMetricExporter
+        
+        return [PeriodicExportingMetricReader(
+            OTLPMetricExporter(endpoint=OTLP_METRICS_ENDPOINT),
+            export_interval_millis=METRICS_EXPORT_INTERVAL_MS
+        )]
+    return []
+
+def create_meter_provider(readers):
+    # Request durations use the same buckets as the load report
+    duration_view = View(
+        instrument_name=REQUEST_DURATION_METRIC,
+        aggregation=ExplicitBucketHistogramAggregation(LATENCY_BUCKETS_MS)
+    )
+    return MeterProvider(resource=resource, metric_readers=readers, views=[duration_view])
+
+def setup_metrics(exporter=METRICS_EXPORTER):
+    # Called from the entry point, so importing the client neither binds a port nor starts exporting.
+    # Instruments created before it record into the provider set here
+    meter_provider = create_meter_provider(metric_readers(exporter))
+    metrics.set_meter_provider(meter_provider)
+    return meter_provider
+
+class ClientMetrics:
+    def __init__(self, meter):
+        self.request_duration = meter.create_histogram(
+            REQUEST_DURATION_METRIC, unit="ms", description="Duration of batch API requests"
+        )
+        self.requests_in_flight = meter.create_up_down_counter(
+            "batch_client.requests.in_flight", description="Batch API requests in progress"
+        )
+        self.requests_succeeded = meter.create_counter(
+            "batch_client.requests.succeeded", description="Successful batch API requests"
+        )
+        self.requests_failed = meter.create_counter(
+            "batch_client.requests.failed", description="Failed batch API requests"
+        )
+    
+    @contextmanager
+    def track(self, endpoint):
+        attributes = {"endpoint": endpoint}
+        outcome = {"ok": False}
+        self.requests_in_flight.add(1, attributes)
+        started = time.perf_counter()
+        try:
+            yield outcome
+        finally:
+            self.request_duration.record((time.perf_counter() - started) * 1000, attributes)
+            self.requests_in_flight.add(-1, attributes)
+            counter = self.requests_succeeded if outcome["ok"] else self.requests_failed
+            counter.add(1, attributes)
+
+client_metrics = ClientMetrics(metrics.get_meter(__name__))
+
+def tracked(endpoint):
+    # Records request metrics of a client method; None or False as the result counts as a failure
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.metrics.track(endpoint) as outcome:
+                result = method(self, *args, **kwargs)
+                outcome["ok"] = result is not None and result is not False
+            return result
+        return wrapper
+    return decorator
 
 class BatchJobClient:
-    def __init__(self, base_url):
+    def __init__(self, base_url, pool_size=DEFAULT_POOL_SIZE, timeouts=None, status_retries=STATUS_RETRIES,
+                 request_metrics=None, tracer_provider=None):
         self.base_url = base_url
+        self.metrics = request_metrics or client_metrics
+        self.tracer = tracer_provider.get_tracer(__name__) if tracer_provider else tracer
+        self.timeouts = {**ENDPOINT_TIMEOUTS, **(timeouts or {})}
         self.session = requests.Session()
+        
+        # Status codes and read errors are retried only for GET status checks: repeating a POST
+        # could start the job twice. Connection errors are retried for any method, the request
+        # never reached the server
+        retry = Retry(
+            total=status_retries,
+            backoff_factor=STATUS_RETRY_BACKOFF,
+            status_forcelist=RETRY_STATUS_CODES,
+            allowed_methods=frozenset({"GET", "HEAD"}),
+            raise_on_status=False,
+        )
+        # pool_maxsize caps the keep-alive connections per host: with fewer than there are workers,
+        # every extra connection is closed after its request and opened again for the next one
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
     
+    def connection_stats(self):
+        # urllib3 pools count new connections and requests; the difference went over reused connections
+        pools = []
+        for adapter in set(self.session.adapters.values()):
+            pool_manager = adapter.poolmanager
+            pools.extend(pool_manager.pools[key] for key in pool_manager.pools.keys())
+        
+        requests_sent = sum(pool.num_requests for pool in pools)
+        connections = sum(pool.num_connections for pool in pools)
+        return {
+            "requests": requests_sent,
+            "connections_opened": connections,
+            "connections_reused": requests_sent - connections,
+            "reuse_ratio": (requests_sent - connections) / requests_sent if requests_sent else 0.0,
+        }
+    
+    @tracked("run-batch")
     def trigger_batch_job(self):
         uri = f"{self.base_url}/api/run-batch"
         
-        with tracer.start_as_current_span("trigger_batch_job") as span:
+        with self.tracer.start_as_current_span("trigger_batch_job") as span:
             span.set_attribute("http.method", "POST")
             span.set_attribute("http.url", uri)
             span.set_attribute("service.name", "batch-client")
@@ -46,7 +230,7 @@ class BatchJobClient:
             logger.info(f"Triggering batch job at {uri}")
             
             try:
-                response = self.session.post(uri, timeout=30)
+                response = self.session.post(uri, timeout=self.timeouts["run-batch"])
                 
                 span.set_attribute("http.status_code", response.status_code)
                 
@@ -66,17 +250,18 @@ class BatchJobClient:
                 span.record_exception(e)
                 return False
     
+    @tracked("status")
     def check_status(self):
         uri = f"{self.base_url}/api/status"
         
-        with tracer.start_as_current_span("check_application_status") as span:
+        with self.tracer.start_as_current_span("check_application_status") as span:
             span.set_attribute("http.method", "GET")
             span.set_attribute("http.url", uri)
             
             logger.info(f"Checking application status at {uri}")
             
             try:
-                response = self.session.get(uri, timeout=10)
+                response = self.session.get(uri, timeout=self.timeouts["status"])
                 
                 span.set_attribute("http.status_code", response.status_code)
                 
@@ -95,12 +280,283 @@ class BatchJobClient:
                 span.record_exception(e)
                 return False
 
-def main():
+    @tracked("jobs")
+    def submit_batch_job(self):
+        uri = f"{self.base_url}/api/jobs"
+        
+        with self.tracer.start_as_current_span("submit_batch_job") as span:
+            span.set_attribute("http.method", "POST")
+            span.set_attribute("http.url", uri)
+            
+            logger.info(f"Submitting batch job at {uri}")
+            
+            try:
+                response = self.session.post(uri, timeout=self.timeouts["jobs"])
+                
+                span.set_attribute("http.status_code", response.status_code)
+                
+                if response.status_code == 202:
+                    job_id = response.json()["jobExecutionId"]
+                    span.set_attribute("job.id", job_id)
+                    logger.info(f"Batch job {job_id} submitted")
+                    return job_id
+                else:
+                    logger.error(f"Failed to submit batch job: {response.status_code} - {response.text}")
+                    span.set_attribute("error", True)
+                    return None
+                    
+            except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+                logger.error(f"Error submitting batch job: {str(e)}")
+                span.set_attribute("error", True)
+                span.record_exception(e)
+                return None
+    
+    @tracked("job-status")
+    def get_job_status(self, job_id):
+        uri = f"{self.base_url}/api/jobs/{job_id}"
+        
+        with self.tracer.start_as_current_span("get_job_status") as span:
+            span.set_attribute("http.method", "GET")
+            span.set_attribute("http.url", uri)
+            span.set_attribute("job.id", job_id)
+            
+            try:
+                response = self.session.get(uri, timeout=self.timeouts["job-status"])
+                
+                span.set_attribute("http.status_code", response.status_code)
+                
+                if response.status_code == 200:
+                    status = response.json()
+                    span.set_attribute("job.status", status["status"])
+                    return status
+                else:
+                    logger.warning(f"Status of batch job {job_id} returned {response.status_code}")
+                    return None
+                    
+            except (requests.exceptions.RequestException, ValueError) as e:
+                logger.error(f"Error checking batch job {job_id}: {str(e)}")
+                span.set_attribute("error", True)
+                span.record_exception(e)
+                return None
+    
+    def wait_for_jobs(self, job_ids, timeout=JOB_WAIT_TIMEOUT,
+                      initial_delay=POLL_INITIAL_DELAY, max_delay=POLL_MAX_DELAY):
+        # All jobs are polled from one thread, each with its own backoff, and no connection
+        # is held open while a job runs. Returns the last known status of every job
+        deadline = time.monotonic() + timeout
+        attempts = {job_id: 0 for job_id in job_ids}
+        next_poll = {job_id: time.monotonic() + poll_delay(0, initial_delay, max_delay) for job_id in job_ids}
+        statuses = {job_id: None for job_id in job_ids}
+        
+        with self.tracer.start_as_current_span("wait_for_jobs") as span:
+            span.set_attribute("jobs.count", len(job_ids))
+            
+            while next_poll:
+                job_id = min(next_poll, key=next_poll.get)
+                if next_poll[job_id] > deadline:
+                    break
+                
+                delay = next_poll[job_id] - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                
+                status = self.get_job_status(job_id) or statuses[job_id]
+                statuses[job_id] = status
+                
+                if status and status["status"] in TERMINAL_JOB_STATUSES:
+                    logger.info(f"Batch job {job_id} finished with status {status['status']}")
+                    del next_poll[job_id]
+                    continue
+                
+                attempts[job_id] += 1
+                next_poll[job_id] = time.monotonic() + poll_delay(attempts[job_id], initial_delay, max_delay)
+            
+            for job_id in next_poll:
+                logger.warning(f"Timed out waiting for batch job {job_id}")
+            
+            span.set_attribute("jobs.unfinished", len(next_poll))
+        
+        return statuses
+    
+    def wait_for_job(self, job_id, timeout=JOB_WAIT_TIMEOUT):
+        return self.wait_for_jobs([job_id], timeout)[job_id]
+    
+    def run_batch_job_async(self, timeout=JOB_WAIT_TIMEOUT):
+        job_id = self.submit_batch_job()
+        if job_id is None:
+            return False
+        
+        status = self.wait_for_job(job_id, timeout)
+        return bool(status) and status["status"] == "COMPLETED"
+    
+    def _timed_call(self, operation, scheduled_at):
+        # Latency is counted from the scheduled start, so queueing behind a saturated pool
+        # shows up in the numbers instead of silently lowering the request rate
+        ok = operation()
+        return ok, time.perf_counter() - scheduled_at
+    
+    def _open_loop(self, executor, operation, rate, duration):
+        results = []
+        interval = 1.0 / rate
+        started = time.perf_counter()
+        sent = 0
+        
+        while sent * interval < duration:
+            scheduled_at = started + sent * interval
+            delay = scheduled_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            results.append(executor.submit(self._timed_call, operation, scheduled_at))
+            sent += 1
+        
+        return [future.result() for future in results]
+    
+    def _closed_loop(self, executor, operation, concurrency, duration):
+        deadline = time.perf_counter() + duration
+        
+        def worker():
+            results = []
+            while time.perf_counter() < deadline:
+                results.append(self._timed_call(operation, time.perf_counter()))
+            return results
+        
+        workers = [executor.submit(worker) for _ in range(concurrency)]
+        return [result for future in workers for result in future.result()]
+    
+    def run_load(self, endpoint="run-batch", concurrency=4, rate=None, duration=30):
+        operations = {
+            "run-batch": self.trigger_batch_job,
+            "status": self.check_status,
+            "jobs": self.run_batch_job_async,
+        }
+        operation = operations[endpoint]
+        
+        # With a rate the load is open-loop: requests start on schedule regardless of responses.
+        # Without it, each of the concurrency workers sends the next request after the previous one
+        mode = "open-loop" if rate else "closed-loop"
+        logger.info(f"Starting {mode} load on /api/{endpoint}: concurrency={concurrency}, rate={rate}, duration={duration}s")
+        
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            if rate:
+                results = self._open_loop(executor, operation, rate, duration)
+            else:
+                results = self._closed_loop(executor, operation, concurrency, duration)
+        elapsed = time.perf_counter() - started
+        
+        report = load_report(results, elapsed)
+        report.update({"endpoint": endpoint, "mode": mode, "concurrency": concurrency, "rate": rate})
+        report["connections"] = self.connection_stats()
+        log_load_report(report)
+        return report
+
+def poll_delay(attempt, initial_delay, max_delay):
+    # Exponential backoff with equal jitter: half of the delay is fixed, half is random,
+    # so jobs submitted together do not poll the server in lockstep
+    delay = min(max_delay, initial_delay * 2 ** attempt)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+def percentile(sorted_values, fraction):
+    # Nearest-rank percentile
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)]
+
+def load_report(results, elapsed):
+    latencies = sorted(latency * 1000 for _, latency in results)
+    errors = sum(1 for ok, _ in results if not ok)
+    
+    histogram = []
+    for bound in LATENCY_BUCKETS_MS + [float("inf")]:
+        histogram.append({"le": bound, "count": sum(1 for latency in latencies if latency <= bound)})
+    
+    return {
+        "requests": len(results),
+        "errors": errors,
+        "error_rate": errors / len(results) if results else 0.0,
+        "duration_s": elapsed,
+        "throughput_rps": len(results) / elapsed if elapsed > 0 else 0.0,
+        "latency_ms": {
+            "p50": percentile(latencies, 0.50),
+            "p95": percentile(latencies, 0.95),
+            "p99": percentile(latencies, 0.99),
+            "max": latencies[-1] if latencies else 0.0,
+            "mean": sum(latencies) / len(latencies) if latencies else 0.0,
+        },
+        "histogram_ms": histogram,
+    }
+
+def log_load_report(report):
+    latency = report["latency_ms"]
+    logger.info(
+        f"Load finished: {report['requests']} requests in {report['duration_s']:.1f}s, "
+        f"{report['throughput_rps']:.1f} req/s, error rate {report['error_rate'] * 100:.2f}%"
+    )
+    logger.info(
+        f"Latency ms: p50={latency['p50']:.1f} p95={latency['p95']:.1f} "
+        f"p99={latency['p99']:.1f} max={latency['max']:.1f} mean={latency['mean']:.1f}"
+    )
+    
+    if "connections" in report:
+        log_connection_stats(report["connections"])
+    
+    lower, previous = 0, 0
+    for bucket in report["histogram_ms"]:
+        in_bucket = bucket["count"] - previous
+        if in_bucket:
+            logger.info(f"Latency {lower}-{bucket['le']} ms: {in_bucket}")
+        lower, previous = bucket["le"], bucket["count"]
+
+def log_connection_stats(stats):
+    logger.info(
+        f"Connections: {stats['connections_opened']} opened for {stats['requests']} requests, "
+        f"{stats['connections_reused']} reused ({stats['reuse_ratio'] * 100:.1f}%)"
+    )
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Batch processing API client")
+    parser.add_argument("--base-url", default=os.getenv("BATCH_API_URL", "http://app:8080"))
+    parser.add_argument("--load", action="store_true", help="Run load generation instead of the 5 demo jobs")
+    parser.add_argument("--submit", type=int, metavar="N", help="Submit N jobs asynchronously and wait for all of them")
+    parser.add_argument("--wait-timeout", type=float, default=JOB_WAIT_TIMEOUT, help="Max wait for submitted jobs, seconds")
+    parser.add_argument("--endpoint", choices=["run-batch", "status", "jobs"], default="run-batch",
+                        help="jobs: submit via /api/jobs and poll until the job finishes")
+    parser.add_argument("--concurrency", type=int, default=4, help="Worker threads, also the HTTP connection pool size")
+    parser.add_argument("--rate", type=float, help="Target requests per second (open-loop); closed-loop if omitted")
+    parser.add_argument("--duration", type=float, default=30, help="Load duration, seconds")
+    return parser.parse_args()
+
+def run_load(args):
+    with tracer.start_as_current_span("batch_client_load") as load_span:
+        client = BatchJobClient(args.base_url, pool_size=args.concurrency)
+        report = client.run_load(args.endpoint, args.concurrency, args.rate, args.duration)
+        
+        load_span.set_attribute("load.requests", report["requests"])
+        load_span.set_attribute("load.errors", report["errors"])
+        return report
+
+def run_async_jobs(args):
+    with tracer.start_as_current_span("batch_client_async_jobs") as jobs_span:
+        client = BatchJobClient(args.base_url)
+        
+        job_ids = [client.submit_batch_job() for _ in range(args.submit)]
+        submitted = [job_id for job_id in job_ids if job_id is not None]
+        statuses = client.wait_for_jobs(submitted, args.wait_timeout)
+        
+        completed = sum(1 for status in statuses.values() if status and status["status"] == "COMPLETED")
+        jobs_span.set_attribute("total.success", completed)
+        jobs_span.set_attribute("total.failed", args.submit - completed)
+        
+        logger.info(f"Async jobs finished. Submitted: {len(submitted)}/{args.submit}, Completed: {completed}")
+        log_connection_stats(client.connection_stats())
+        return statuses
+
+def main(args):
     with tracer.start_as_current_span("batch_client_main") as main_span:
         main_span.set_attribute("service.name", "batch-client")
         main_span.set_attribute("operation.type", "batch_trigger")
         
-        client = BatchJobClient("http://app:8080")
+        client = BatchJobClient(args.base_url)
         
         logger.info("Starting batch job client")
         
@@ -115,7 +571,8 @@ def main():
         fail_count = 0
         
         for i in range(5):
-            with tracer.start_as_current_span(f"job_execution_{i+1}") as job_span:
+            # One span name for all iterations, the iteration number is an attribute
+            with tracer.start_as_current_span("job_execution") as job_span:
                 job_span.set_attribute("job.iteration", i+1)
                 logger.info(f"Starting job execution #{i+1}")
                 
@@ -133,8 +590,20 @@ def main():
         main_span.set_attribute("total.failed", fail_count)
         
         logger.info(f"Job execution completed. Success: {success_count}, Failed: {fail_count}")
+        log_connection_stats(client.connection_stats())
         
         time.sleep(2)
 
 if __name__ == "__main__":
-    main()
+    args = parse_args()
+    meter_provider = setup_metrics()
+    try:
+        if args.load:
+            run_load(args)
+        elif args.submit:
+            run_async_jobs(args)
+        else:
+            main(args)
+    finally:
+        # Pushes the final values: the client exits right after its run
+        meter_provider.shutdown()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+
+import os
+import json
+import time
+import logging
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# The benchmark builds its own tracer providers, so the client must not set up its OTLP tracing on import
+os.environ["TRACING_ENABLED"] = "false"
+
+from opentelemetry import metrics, trace
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+from opentelemetry.instrumentation.requests import RequestsInstrumentor
+
+from batch_client import BatchJobClient, create_sampler, create_tracer_provider, logger, percentile
+
+class StatusHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        body = b"Batch Processing Application is running"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StatusHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def measure(base_url, requests_count, warmup, tracer_provider):
+    # requests is instrumented only while the mode is measured, as the client does on import.
+    # Its HTTP metrics are switched off: only the tracing cost is measured
+    instrumentor = RequestsInstrumentor()
+    if tracer_provider:
+        instrumentor.instrument(tracer_provider=tracer_provider, meter_provider=metrics.NoOpMeterProvider())
+
+    try:
+        client = BatchJobClient(base_url, pool_size=1, tracer_provider=tracer_provider or trace.NoOpTracerProvider())
+        for _ in range(warmup):
+            client.check_status()
+
+        durations = []
+        for _ in range(requests_count):
+            started = time.perf_counter()
+            client.check_status()
+            durations.append(time.perf_counter() - started)
+        return durations
+    finally:
+        if tracer_provider:
+            instrumentor.uninstrument()
+
+def run(args):
+    server = start_stub_server()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    exporters = {"sampled": InMemorySpanExporter(), "full": InMemorySpanExporter()}
+    providers = {
+        "off": None,
+        "sampled": create_tracer_provider(exporters["sampled"], create_sampler(args.sample_ratio)),
+        "full": create_tracer_provider(exporters["full"], create_sampler(1.0)),
+    }
+    durations = {mode: [] for mode in providers}
+
+    # Per-request logging of the client would outweigh the tracing itself
+    logger.setLevel(logging.WARNING)
+    try:
+        # Modes alternate every round, so drift of the machine affects all of them equally
+        for _ in range(args.rounds):
+            for mode, provider in providers.items():
+                durations[mode].extend(measure(base_url, args.requests, args.warmup, provider))
+    finally:
+        logger.setLevel(logging.INFO)
+        server.shutdown()
+
+    results = {}
+    for mode, values in durations.items():
+        values = sorted(value * 1_000_000 for value in values)
+        spans = 0
+        if providers[mode]:
+            providers[mode].force_flush()
+            spans = len(exporters[mode].get_finished_spans())
+
+        results[mode] = {
+            "requests": len(values),
+            "mean_us": round(sum(values) / len(values), 1),
+            "p50_us": round(percentile(values, 0.50), 1),
+            "p99_us": round(percentile(values, 0.99), 1),
+            "spans_exported": spans,
+        }
+
+    for mode, stats in results.items():
+        stats["overhead_us"] = round(stats["mean_us"] - results["off"]["mean_us"], 1)
+        logger.info(
+            f"{mode}: mean {stats['mean_us']} us, p50 {stats['p50_us']} us, p99 {stats['p99_us']} us, "
+            f"overhead {stats['overhead_us']} us per request, {stats['spans_exported']} spans"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        logger.info(f"Benchmark results saved: {args.output}")
+
+    return results
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Per-request tracing overhead of the batch client")
+    parser.add_argument("--requests", type=int, default=2000, help="Measured requests per mode and round")
+    parser.add_argument("--warmup", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--sample-ratio", type=float, default=0.1, help="Sampling ratio of the sampled mode")
+    parser.add_argument("--output", help="Save results as JSON")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    run(parse_args())
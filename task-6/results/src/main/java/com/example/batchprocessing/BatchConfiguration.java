@@ -5,6 +5,8 @@ import javax.sql.DataSource;
 import org.springframework.batch.core.Job;
 import org.springframework.batch.core.Step;
 import org.springframework.batch.core.job.builder.JobBuilder;
+import org.springframework.batch.core.launch.JobLauncher;
+import org.springframework.batch.core.launch.support.TaskExecutorJobLauncher;
 import org.springframework.batch.core.repository.JobRepository;
 import org.springframework.batch.core.step.builder.StepBuilder;
 import org.springframework.batch.item.database.JdbcBatchItemWriter;
@@ -13,11 +15,13 @@ import org.springframework.batch.item.database.BeanPropertyItemSqlParameterSourc
 import org.springframework.batch.item.file.FlatFileItemReader;
 import org.springframework.batch.item.file.builder.FlatFileItemReaderBuilder;
 import org.springframework.beans.factory.annotation.Autowired;
+import org.springframework.beans.factory.annotation.Value;
 import org.springframework.context.annotation.Bean;
 import org.springframework.context.annotation.Configuration;
 import org.springframework.core.io.ClassPathResource;
 import org.springframework.jdbc.core.JdbcTemplate;
 import org.springframework.jdbc.datasource.DataSourceTransactionManager;
+import org.springframework.scheduling.concurrent.ThreadPoolTaskExecutor;
 
 @Configuration
 public class BatchConfiguration {
@@ -66,4 +70,27 @@ public class BatchConfiguration {
 			.build();
 	}
 
+	@Bean
+	public ThreadPoolTaskExecutor batchJobExecutor(@Value("${batch.async.pool-size:4}") int poolSize,
+												   @Value("${batch.async.queue-capacity:100}") int queueCapacity) {
+		ThreadPoolTaskExecutor executor = new ThreadPoolTaskExecutor();
+		executor.setCorePoolSize(poolSize);
+		executor.setMaxPoolSize(poolSize);
+		executor.setQueueCapacity(queueCapacity);
+		executor.setThreadNamePrefix("batch-job-");
+		executor.initialize();
+		return executor;
+	}
+
+	// Launcher for POST /api/jobs: returns as soon as the job execution is created,
+	// the job itself runs on batchJobExecutor
+	@Bean
+	public JobLauncher asyncJobLauncher(JobRepository jobRepository, ThreadPoolTaskExecutor batchJobExecutor) throws Exception {
+		TaskExecutorJobLauncher jobLauncher = new TaskExecutorJobLauncher();
+		jobLauncher.setJobRepository(jobRepository);
+		jobLauncher.setTaskExecutor(batchJobExecutor);
+		jobLauncher.afterPropertiesSet();
+		return jobLauncher;
+	}
+
 }
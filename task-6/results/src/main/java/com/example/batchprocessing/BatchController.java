@@ -4,10 +4,16 @@ import org.slf4j.Logger;
 import org.slf4j.LoggerFactory;
 import org.slf4j.MDC;
 import org.springframework.batch.core.Job;
+import org.springframework.batch.core.JobExecution;
 import org.springframework.batch.core.JobParameters;
 import org.springframework.batch.core.JobParametersBuilder;
+import org.springframework.batch.core.explore.JobExplorer;
 import org.springframework.batch.core.launch.JobLauncher;
+import org.springframework.beans.factory.annotation.Qualifier;
+import org.springframework.http.HttpStatus;
+import org.springframework.http.ResponseEntity;
 import org.springframework.web.bind.annotation.GetMapping;
+import org.springframework.web.bind.annotation.PathVariable;
 import org.springframework.web.bind.annotation.PostMapping;
 import org.springframework.web.bind.annotation.RequestHeader;
 import org.springframework.web.bind.annotation.RequestMapping;
@@ -15,6 +21,9 @@ import org.springframework.web.bind.annotation.RestController;
 
 import jakarta.servlet.http.HttpServletRequest;
 
+import java.util.LinkedHashMap;
+import java.util.Map;
+
 @RestController
 @RequestMapping("/api")
 public class BatchController {
@@ -22,10 +31,17 @@ public class BatchController {
     private static final Logger log = LoggerFactory.getLogger(BatchController.class);
 
     private final JobLauncher jobLauncher;
+    private final JobLauncher asyncJobLauncher;
+    private final JobExplorer jobExplorer;
     private final Job importProductJob;
 
-    public BatchController(JobLauncher jobLauncher, Job importProductJob) {
+    public BatchController(@Qualifier("jobLauncher") JobLauncher jobLauncher,
+                           @Qualifier("asyncJobLauncher") JobLauncher asyncJobLauncher,
+                           JobExplorer jobExplorer,
+                           Job importProductJob) {
         this.jobLauncher = jobLauncher;
+        this.asyncJobLauncher = asyncJobLauncher;
+        this.jobExplorer = jobExplorer;
         this.importProductJob = importProductJob;
     }
 
@@ -74,6 +90,57 @@ public class BatchController {
         }
     }
     
+    @PostMapping("/jobs")
+    public ResponseEntity<Map<String, Object>> submitJob(
+            HttpServletRequest request,
+            @RequestHeader(value = "X-Trace-Id", required = false) String traceId,
+            @RequestHeader(value = "X-Span-Id", required = false) String spanId) {
+        
+        setupMDC(request, traceId, spanId);
+        
+        try {
+            JobParameters jobParameters = new JobParametersBuilder()
+                .addLong("time", System.currentTimeMillis())
+                .addString("traceId", traceId != null ? traceId : MDC.get("traceId"))
+                .toJobParameters();
+            
+            JobExecution jobExecution = asyncJobLauncher.run(importProductJob, jobParameters);
+            
+            // If the executor queue is full the launcher marks the execution FAILED instead of throwing
+            log.info("Batch job {} submitted via REST API with status {}", jobExecution.getId(), jobExecution.getStatus());
+            
+            return ResponseEntity.status(HttpStatus.ACCEPTED).body(jobExecutionBody(jobExecution));
+            
+        } catch (Exception e) {
+            log.error("Error submitting batch job via REST API", e);
+            return ResponseEntity.status(HttpStatus.INTERNAL_SERVER_ERROR).body(Map.of("error", String.valueOf(e.getMessage())));
+        } finally {
+            clearMDC();
+        }
+    }
+
+    @GetMapping("/jobs/{id}")
+    public ResponseEntity<Map<String, Object>> jobStatus(@PathVariable("id") long id) {
+        JobExecution jobExecution = jobExplorer.getJobExecution(id);
+        
+        if (jobExecution == null) {
+            return ResponseEntity.status(HttpStatus.NOT_FOUND).body(Map.of("error", "Job execution " + id + " not found"));
+        }
+        
+        return ResponseEntity.ok(jobExecutionBody(jobExecution));
+    }
+    
+    private Map<String, Object> jobExecutionBody(JobExecution jobExecution) {
+        Map<String, Object> body = new LinkedHashMap<>();
+        body.put("jobExecutionId", jobExecution.getId());
+        body.put("status", jobExecution.getStatus().name());
+        body.put("running", jobExecution.isRunning());
+        body.put("exitCode", jobExecution.getExitStatus().getExitCode());
+        body.put("startTime", jobExecution.getStartTime());
+        body.put("endTime", jobExecution.getEndTime());
+        return body;
+    }
+    
     private void setupMDC(HttpServletRequest request, String traceId, String spanId) {
         if (traceId != null && !traceId.isEmpty()) {
             MDC.put("traceId", traceId);